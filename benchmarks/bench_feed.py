@@ -0,0 +1,79 @@
+# Бенчмарк генерації YML: старий шлях через ElementTree проти потокового core.yml_generator.
+# Запуск: python -m benchmarks.bench_feed [кількість_офферів]
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from core.records import Match, Recommendation, RozetkaItem, SupplierOffer
+from core.yml_generator import write_rozetka_yml
+
+
+def make_matches(n):
+    """Синтетичні матчі з рекомендаціями, як після calculate_new_prices."""
+    for i in range(n):
+        price = 199 + (i % 500) * 100
+        yield Match(
+            id=str(500000000 + i),
+            price_offer_id=f"U{i:07d}",
+            rozetka=RozetkaItem(name=f"Товар №{i} & <аксесуар>"),
+            supplier=SupplierOffer(0.0, 0.0, available="true" if i % 3 else "false",
+                                   stock_quantity=100 if i % 3 else 0),
+            recommendations=Recommendation(price, round(price * 1.2, 2)),
+        )
+
+
+def write_elementtree(matches, output_file):
+    """Попередня реалізація generate_rozetka_xml: все дерево в пам'яті, потім tree.write."""
+    yml = ET.Element("yml_catalog", date=datetime.now().strftime("%Y-%m-%d %H:%M"))
+    shop = ET.SubElement(yml, "shop")
+    ET.SubElement(shop, "name").text = "My Shop"
+    ET.SubElement(shop, "company").text = "My Company"
+    ET.SubElement(shop, "url").text = "https://myshop.ua"
+    currencies = ET.SubElement(shop, "currencies")
+    ET.SubElement(currencies, "currency", id="UAH", rate="1")
+    categories = ET.SubElement(shop, "categories")
+    ET.SubElement(categories, "category", id="1").text = "Default"
+    offers = ET.SubElement(shop, "offers")
+    for match in matches:
+        offer = ET.SubElement(offers, "offer", id=match.price_offer_id, available=match.supplier.available)
+        ET.SubElement(offer, "price").text = str(match.recommendations.final_price)
+        ET.SubElement(offer, "oldprice").text = str(match.recommendations.old_price_recommended)
+        ET.SubElement(offer, "currencyId").text = "UAH"
+        ET.SubElement(offer, "categoryId").text = "1"
+        ET.SubElement(offer, "stock_quantity").text = str(match.supplier.stock_quantity)
+        ET.SubElement(offer, "name").text = match.rozetka.name
+    ET.ElementTree(yml).write(output_file, encoding="utf-8", xml_declaration=True)
+
+
+def measure(label, func, n, output_file):
+    """Час — окремим прогоном без tracemalloc (він сповільнює код у рази), пік пам'яті — другим."""
+    start = time.perf_counter()
+    func(make_matches(n), output_file)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(make_matches(n), output_file)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<14} n={n}: {elapsed:.2f} с, пік пам'яті {peak / 1e6:.1f} МБ, "
+          f"файл {os.path.getsize(output_file) / 1e6:.1f} МБ")
+    return elapsed, peak
+
+
+def run(n=100000):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        results['elementtree'] = measure("ElementTree", write_elementtree, n, os.path.join(tmp, "et.xml"))
+        results['streaming'] = measure("streaming", write_rozetka_yml, n, os.path.join(tmp, "stream.xml"))
+        results['streaming_gzip'] = measure("streaming+gz", write_rozetka_yml, n, os.path.join(tmp, "stream.xml.gz"))
+    return results
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,60 @@
+# Бенчмарк match_and_compare на синтетичних каталогах.
+# Запуск: python -m benchmarks.bench_matching [кількість_товарів]
+import logging
+import random
+import sys
+import time
+
+from core.calculations import match_and_compare
+from core.records import RozetkaItem, SupplierOffer
+
+
+def make_catalogs(n, overlap=0.8, seed=42):
+    """Синтетичні каталоги: n товарів Rozetka і n офферів постачальника, частка overlap спільних."""
+    rnd = random.Random(seed)
+    shared = int(n * overlap)
+    rozetka_items = {}
+    for i in range(n):
+        offer_id = f"U{i:07d}" if i < shared else f"RZ{i:07d}"
+        price = rnd.randint(100, 50000)
+        rozetka_items[str(500000000 + i)] = RozetkaItem(
+            name=f"Товар {i}",
+            price=price,
+            price_old=int(price * 1.2),
+            brand='-',
+            available=rnd.choice([0, 1]),
+            stock_quantity=rnd.choice([0, 100]),
+            price_offer_id=offer_id,
+        )
+
+    supplier_dict = {}
+    for i in range(n):
+        offer_id = f"U{i:07d}" if i < shared else f"SP{i:07d}"
+        purchase = rnd.randint(80, 40000)
+        available = rnd.choice(["true", "false"])
+        supplier_dict[offer_id] = SupplierOffer(
+            purchase_price=float(purchase),
+            supplier_price=float(int(purchase * 1.25)),
+            old_price=float(int(purchase * 1.5)),
+            available=available,
+            stock_quantity=100 if available == "true" else 0,
+        )
+    return rozetka_items, supplier_dict
+
+
+def run(n=100000):
+    rozetka_items, supplier_dict = make_catalogs(n)
+    results = {}
+    for with_differences in (True, False):
+        start = time.perf_counter()
+        result = match_and_compare(rozetka_items, supplier_dict, with_differences=with_differences)
+        elapsed = time.perf_counter() - start
+        results[with_differences] = elapsed
+        print(f"match_and_compare n={n} with_differences={with_differences}: {elapsed:.3f} с "
+              f"({len(result[0])} матчів, {len(result[1])} тільки Rozetka, {len(result[2])} тільки постачальник)")
+    return results
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
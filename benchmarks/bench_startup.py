@@ -0,0 +1,33 @@
+# Бенчмарк старту CLI: час імпортів кожної команди main.py у свіжому процесі (python main.py --import-time).
+# Запуск: python -m benchmarks.bench_startup [кількість_повторів]
+import os
+import subprocess
+import sys
+import time
+
+from main import COMMANDS
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+
+def measure(command, repeat):
+    """Найкращий з repeat прогонів: повний час процесу (з інтерпретатором) і рядок про імпорти з CLI."""
+    best = None
+    output = ''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, MAIN, '--log-level', 'ERROR', '--import-time', command],
+                                capture_output=True, text=True, check=True)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best, output = elapsed, result.stdout.strip()
+    print(f"{command:<16} процес {best * 1000:>6.0f} мс  ({output})")
+    return best
+
+
+def run(repeat=5):
+    return {command: measure(command, repeat) for command in COMMANDS}
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
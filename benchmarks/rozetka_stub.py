@@ -0,0 +1,93 @@
+# Локальний aiohttp-стаб Rozetka Seller API для бенчмарків: /goods/on-sale, /market-categories/search
+# і /items/mass-update (push цін).
+import asyncio
+import random
+
+from aiohttp import web
+
+PRICE_UPDATE_PATH = '/items/mass-update'  # Шлях оновлення цін у стабі (push_prices(..., path=PRICE_UPDATE_PATH))
+
+
+class RozetkaStub:
+    """Віддає items посторінково і categories за category_id, приймає оновлення цін; рахує запити.
+
+    delay — затримка відповіді (імітація мережі), fail_rate — частка відповідей 429/5xx для перевірки повторів.
+    updates — останні прийняті оновлення {price_offer_id: item}; невідомий price_offer_id — помилка по товару.
+    idempotency_keys — Idempotency-Key кожного запиту оновлення в порядку надходження (з невдалими спробами).
+    """
+
+    def __init__(self, items, categories, delay=0.0, fail_rate=0.0, seed=42):
+        self.items = items
+        self.categories = categories
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.requests = {'on_sale': 0, 'categories': 0, 'mass_update': 0}
+        self.updates = {}
+        self.idempotency_keys = []
+        self._known = None
+        self._random = random.Random(seed)
+        self._runner = None
+        self.base_url = None
+
+    async def _pause_or_fail(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_rate and self._random.random() < self.fail_rate:
+            return web.Response(status=self._random.choice([429, 500, 503]))
+        return None
+
+    async def _on_sale(self, request):
+        self.requests['on_sale'] += 1
+        failed = await self._pause_or_fail()
+        if failed is not None:
+            return failed
+        page, size = int(request.query.get('page', 1)), int(request.query.get('pageSize', 100))
+        chunk = self.items[(page - 1) * size: page * size]
+        return web.json_response({'content': {'items': chunk, '_meta': {'totalCount': len(self.items)}}})
+
+    async def _category(self, request):
+        self.requests['categories'] += 1
+        failed = await self._pause_or_fail()
+        if failed is not None:
+            return failed
+        category = self.categories.get(int(request.query['category_id']))
+        return web.json_response({'content': {'marketCategorys': [category] if category else []}})
+
+    async def _mass_update(self, request):
+        self.requests['mass_update'] += 1
+        payload = await request.json()
+        self.idempotency_keys.append(request.headers.get('Idempotency-Key'))
+        failed = await self._pause_or_fail()
+        if failed is not None:
+            return failed
+
+        if self._known is None:
+            self._known = {str(item.get('price_offer_id')) for item in self.items}
+        results = []
+        for update in payload.get('items', []):
+            offer_id = str(update.get('price_offer_id'))
+            if offer_id in self._known:
+                self.updates[offer_id] = update
+                results.append({'price_offer_id': offer_id, 'success': True})
+            else:
+                results.append({'price_offer_id': offer_id, 'success': False, 'error': 'Товар не знайдено'})
+        return web.json_response({'success': True, 'content': {'results': results}})
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Запускає сервер (port=0 — вільний порт), повертає base_url."""
+        app = web.Application()
+        app.router.add_get('/goods/on-sale', self._on_sale)
+        app.router.add_get('/market-categories/search', self._category)
+        app.router.add_put(PRICE_UPDATE_PATH, self._mass_update)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        self.base_url = f"http://{bound_host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
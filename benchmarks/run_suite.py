@@ -0,0 +1,189 @@
+# Набір бенчмарків етапів пайплайна на синтетичних даних і локальному стабі Rozetka API.
+# Запуск: python -m benchmarks.run_suite [--sizes 1000 10000 100000] [--repeat 3]
+#         [--compare benchmarks/results/<файл>.json]
+# Кожен розмір — в окремому процесі (чистий піковий RSS), результат — JSON у benchmarks/results.
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from benchmarks.rozetka_stub import RozetkaStub
+from benchmarks.synthetic import (make_categories, make_commissions, make_rozetka_items, write_supplier_feed)
+
+RESULTS_DIR = "benchmarks/results"
+DEFAULT_SIZES = (1000, 10000, 50000)
+REGRESSION_THRESHOLD = 0.2  # Повільніше на 20%+ — регресія
+MIN_REGRESSION_S = 0.05  # ...і щонайменше на 50 мс (шум коротких етапів не рахується)
+STAGES = ('parse_gamepro_xml', 'build_items_cache', 'build_items_cache_warm', 'load_commissions',
+          'load_commissions_warm', 'match_and_compare', 'calculate_new_prices', 'write_report',
+          'generate_rozetka_xml', 'compare_xml_changes')
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+async def _run_stages(n, profiler):
+    import core.rozetka_api as api
+    import main
+    from core.calculations import match_and_compare, calculate_new_prices
+    from core.commissions import load_commissions
+    from core.reports import write_report, recommendation_rows, RECOMMENDATION_COLUMNS
+    from parsers.gamepro_parsers import parse_gamepro_xml
+
+    categories, leaf_ids = make_categories(n_leaf=max(20, n // 500))
+    make_commissions(categories, leaf_ids).to_excel('commissions.xlsx', index=False)
+    write_supplier_feed('mental_price.xml', n)
+    write_supplier_feed('mental_price_v2.xml', n, price_change=0.1)
+    stub = RozetkaStub(make_rozetka_items(n, leaf_ids), categories)
+    api.ROZETKA_BASE_URL = await stub.start()
+    try:
+        with profiler.stage('parse_gamepro_xml') as counters:
+            supplier_dict = parse_gamepro_xml('mental_price.xml')
+            counters['offers'] = len(supplier_dict)
+        for name in ('build_items_cache', 'build_items_cache_warm'):  # Повний парсинг, потім валідний кеш
+            with profiler.stage(name) as counters:
+                stats = {}
+                category_requests = stub.requests['categories']
+                items = await api.build_items_cache('bench-token', stats=stats)
+                counters.update(items=len(items), category_requests=stub.requests['categories'] - category_requests,
+                                **stats)
+        for name in ('load_commissions', 'load_commissions_warm'):  # Excel, потім скомпільований артефакт
+            with profiler.stage(name) as counters:
+                df_comm = load_commissions('commissions.xlsx')
+                counters.update(rows=len(df_comm), source=df_comm.source)
+        with profiler.stage('match_and_compare') as counters:
+            matches = match_and_compare(items, supplier_dict)[0]
+            counters['matches'] = len(matches)
+        with profiler.stage('calculate_new_prices') as counters:
+            calculate_new_prices(matches, df_comm)
+            counters['items'] = len(matches)
+        with profiler.stage('write_report') as counters:
+            counters['rows'] = write_report('recommendations.xlsx', RECOMMENDATION_COLUMNS, recommendation_rows(matches))
+
+        # Друга версія фіду (10% змінених цін) — для порівняння двох XML
+        with profiler.stage('generate_rozetka_xml') as counters:
+            counters['offers'] = main.generate_rozetka_xml(matches)
+        matches_v2 = match_and_compare(items, parse_gamepro_xml('mental_price_v2.xml'))[0]
+        main.generate_rozetka_xml(calculate_new_prices(matches_v2, df_comm))
+        with profiler.stage('compare_xml_changes') as counters:
+            counters['changes'] = len(main.compare_xml_changes(main.OLD_XML, main.OUTPUT_XML))
+    finally:
+        await stub.stop()
+
+
+def run_size(n):
+    """Усі етапи для n SKU у тимчасовій теці; повертає {'wall_s', 'rss_peak_mb', 'stages': {...}}."""
+    from utils.logger_setup import RunProfiler
+
+    logging.disable(logging.CRITICAL)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                with RunProfiler(report_dir=os.path.join(workdir, 'reports')) as profiler:
+                    asyncio.run(_run_stages(n, profiler))
+        finally:
+            os.chdir(cwd)
+    report = profiler.report()
+    return {
+        'wall_s': report['wall_s'],
+        'rss_peak_mb': report['rss_peak_mb'],
+        'stages': {record['name']: {key: record[key] for key in ('wall_s', 'cpu_s', 'rss_peak_mb', 'counters')}
+                   for record in report['stages']},
+    }
+
+
+def compare(results, previous, threshold=REGRESSION_THRESHOLD):
+    """Друкує зміну часу етапів відносно попереднього результату, повертає список регресій."""
+    regressions = []
+    print(f"\nПорівняння з {previous.get('revision')} ({previous.get('timestamp')}):")
+    for size, current in results['sizes'].items():
+        before = previous.get('sizes', {}).get(size)
+        if before is None:
+            continue
+        for stage_name, record in current['stages'].items():
+            old = before['stages'].get(stage_name)
+            if not old or not old['wall_s']:
+                continue
+            ratio = record['wall_s'] / old['wall_s']
+            flag = ''
+            if ratio > 1 + threshold and record['wall_s'] - old['wall_s'] >= MIN_REGRESSION_S:
+                flag = '  <-- РЕГРЕСІЯ'
+                regressions.append((size, stage_name, old['wall_s'], record['wall_s']))
+            print(f"n={size:<7} {stage_name:<24} {old['wall_s']:>8.3f} -> {record['wall_s']:>8.3f} с "
+                  f"({(ratio - 1) * 100:+.0f}%){flag}")
+    return regressions
+
+
+def _best_of(runs):
+    """Найкращий (мінімальний) час кожного етапу з кількох прогонів — менше шуму між версіями."""
+    best = runs[0]
+    for other in runs[1:]:
+        if other['wall_s'] < best['wall_s']:
+            best['wall_s'] = other['wall_s']
+        if other['rss_peak_mb'] is not None and (best['rss_peak_mb'] is None
+                                                 or other['rss_peak_mb'] < best['rss_peak_mb']):
+            best['rss_peak_mb'] = other['rss_peak_mb']
+        for stage_name, record in other['stages'].items():
+            if record['wall_s'] < best['stages'][stage_name]['wall_s']:
+                best['stages'][stage_name] = record
+    return best
+
+
+def run(sizes=DEFAULT_SIZES, results_dir=RESULTS_DIR, previous_file=None, repeat=1):
+    results = {
+        'revision': _git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'sizes': {},
+    }
+    for n in sizes:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                runs.append(pool.submit(run_size, n).result())
+        results['sizes'][str(n)] = _best_of(runs)
+        stages = results['sizes'][str(n)]['stages']
+        print(f"\n=== n={n} (RSS пік {results['sizes'][str(n)]['rss_peak_mb'] or '?'} МБ) ===")
+        for stage_name in STAGES:
+            record = stages[stage_name]
+            print(f"{stage_name:<24} {record['wall_s']:>8.3f} с  CPU {record['cpu_s']:>8.3f} с  {record['counters']}")
+
+    os.makedirs(results_dir, exist_ok=True)
+    out_file = os.path.join(results_dir, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['revision']}.json")
+    with open(out_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультати: {out_file}")
+
+    if previous_file:
+        with open(previous_file, 'r', encoding='utf-8') as f:
+            results['regressions'] = compare(results, json.load(f))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк етапів пайплайна на синтетичних даних")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Кількість SKU (1k-200k)")
+    parser.add_argument('--out', default=RESULTS_DIR, help="Тека для JSON з результатами")
+    parser.add_argument('--compare', help="Попередній JSON для порівняння (регресії > 20%%)")
+    parser.add_argument('--repeat', type=int, default=1, help="Прогонів на розмір, береться найкращий час етапу")
+    args = parser.parse_args()
+    result = run(args.sizes, args.out, args.compare, args.repeat)
+    sys.exit(1 if result.get('regressions') else 0)
@@ -0,0 +1,108 @@
+# Синтетичні дані для бенчмарків: фід постачальника (як mental_price.xml), товари й категорії Rozetka
+# (як відповіді /goods/on-sale і /market-categories/search), таблиця комісій (як commissions.xlsx).
+import random
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+BRANDS = ['OfficePro', 'Logitech', 'HyperX', 'Razer', 'Defender', 'A4Tech', 'SteelSeries', 'Trust']
+ROOT_CATEGORY_ID = 4625001  # Корінь дерева: root -> група -> leaf
+
+
+def make_categories(n_leaf=200, per_group=20):
+    """Дерево категорій {id: {'id', 'name', 'parent_id'}} і список leaf id."""
+    categories = {ROOT_CATEGORY_ID: {'id': ROOT_CATEGORY_ID, 'name': "Комп'ютери та ноутбуки", 'parent_id': None}}
+    leaf_ids = []
+    for i in range(n_leaf):
+        group_id = ROOT_CATEGORY_ID + 1 + i // per_group
+        if group_id not in categories:
+            categories[group_id] = {'id': group_id, 'name': f"Група {i // per_group}", 'parent_id': ROOT_CATEGORY_ID}
+        leaf_id = 80000 + i
+        categories[leaf_id] = {'id': leaf_id, 'name': f"Категорія {i}", 'parent_id': group_id}
+        leaf_ids.append(leaf_id)
+    return categories, leaf_ids
+
+
+def make_commissions(categories, leaf_ids, seed=42):
+    """DataFrame у форматі commissions.xlsx: базова комісія, діапазони цін і рядки брендів (без ID)."""
+    rnd = random.Random(seed)
+    rows = []
+    # Комісії задані частково на leaf, частково на групі — як у реальній таблиці
+    cat_ids = leaf_ids[::2] + sorted({categories[leaf_id]['parent_id'] for leaf_id in leaf_ids[1::2]})
+    for cat_id in cat_ids:
+        name = categories[cat_id]['name']
+        percent = rnd.choice([12.0, 15.0, 18.0, 20.0, 22.0])
+        brand = rnd.choice(BRANDS)
+        brand_percent = percent - 5
+        rows.append((cat_id, name, '-', '-', percent))
+        rows.append((None, None, brand, '-', brand_percent))
+        low = rnd.choice([3000, 5000])
+        for high in sorted(rnd.sample([9999, 13999, 18999, 26999, 55999], 3)):
+            percent -= 2
+            rows.append((cat_id, name, '-', f"{low}-{high}", percent))
+            rows.append((None, None, brand, f"{low}-{high}", max(percent - 5, 1)))
+            low = high + 1
+        rows.append((cat_id, name, '-', f"{low}-999999999", percent - 2))
+    return pd.DataFrame(rows, columns=['ID категорії', 'Категорія', 'Бренд', 'Діапазон цін', 'Відсоток комісії'])
+
+
+def offer_id(i):
+    return f"{i:09d}"
+
+
+def make_rozetka_items(n, leaf_ids, overlap=0.9, seed=42):
+    """Сирі товари Rozetka (як у /goods/on-sale); перші overlap*n мають price_offer_id з фіду."""
+    rnd = random.Random(seed)
+    shared = int(n * overlap)
+    items = []
+    for i in range(n):
+        price = rnd.randint(150, 60000)
+        items.append({
+            'rz_item_id': 300000000 + i,
+            'name': f"Миша {rnd.choice(BRANDS)} M{i}",
+            'price': price,
+            'price_old': int(price * 1.2),
+            'commission_percent': 0,
+            'commission_sum': 0,
+            'price_producer_name': rnd.choice(BRANDS),
+            'price_category_id': rnd.choice(leaf_ids),
+            'available': rnd.choice([0, 1]),
+            'stock_quantity': rnd.choice([0, 5, 100]),
+            'price_offer_id': offer_id(i) if i < shared else f"RZ{i:07d}",
+        })
+    return items
+
+
+def write_supplier_feed(path, n, seed=42, price_change=0.0):
+    """YML-фід постачальника у форматі mental_price.xml (ціни з комою, stock, RRP, опис).
+
+    price_change — частка офферів зі зміненою закупівельною ціною (для другої версії фіду).
+    """
+    rnd = random.Random(seed)
+    changed = random.Random(seed + 1)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?><yml_catalog date="2025-11-07 10:05"><shop>\n'
+                '<name>Постачальник</name><company>Постачальник</company><url>https://example.com</url>'
+                '<currencies><currency id="UAH" rate="1" plus="0"/></currencies><categories>\n'
+                '<category id="000000004">Товари</category>\n'
+                '<category id="000000095" parentId="000000004">Миші</category>\n'
+                '</categories><offers>\n')
+        for i in range(n):
+            purchase = rnd.randint(100, 45000) + rnd.randint(0, 99) / 100
+            if price_change and changed.random() < price_change:
+                purchase = round(purchase * 1.05, 2)
+            rrp = int(purchase * 1.35)
+            available = rnd.random() < 0.8
+            brand = rnd.choice(BRANDS)
+            f.write(
+                f'<offer id="{offer_id(i)}" available="{"true" if available else "false"}">\n'
+                f'<stock_quantity>{rnd.randint(1, 200) if available else ""}</stock_quantity>\n'
+                f'<price>{f"{purchase:.2f}".replace(".", ",")}</price>\n'
+                f'<price_rrp>{int(rrp * 1.2)}</price_rrp>\n'
+                + (f'<price_promo_rrp>{rrp}</price_promo_rrp>\n' if rnd.random() < 0.9 else '<price_promo_rrp/>\n')
+                + '<currencyId>UAH</currencyId><categoryId>000000095</categoryId>\n'
+                f'<vendor>Постачальник</vendor><vendorCode>M{i}</vendorCode><brand>{brand}</brand>\n'
+                f'<name>{escape(f"Миша {brand} Wireless M{i}")}</name><url/>\n'
+                f'<description>{escape(f"Бездротова миша {brand} M{i} – для роботи & ігор.")}</description>\n'
+                '</offer>\n')
+        f.write('</offers></shop></yml_catalog>\n')
@@ -1,83 +1,83 @@
 # core/calculations.py
+import hashlib
+import json
 import logging
 import math
+from bisect import bisect_right
 
+from core.records import Match, Recommendation
 
-def match_and_compare(rozetka_items, supplier_dict):
+PRICE_MEMO_VERSION = 1  # Збільшити при зміні формул ціни/округлення — старі записи мемо стануть промахами
+
+
+def match_and_compare(rozetka_items, supplier_dict, with_differences=True):
+    """Співставлення Rozetka і постачальника по price_offer_id за один прохід по кожному каталогу.
+
+    Матчі — core.records.Match з посиланнями на записи Rozetka і постачальника (без копіювання полів).
+    with_differences=False не будує рядки differences для кожного товару (коли потрібні лише лічильники);
+    differences і price_differences тоді містять матчі з differences=None.
+    """
     matches = []
     rozetka_only = []
-    supplier_only = []
     same_price_count = 0
     same_old_price_count = 0
     same_available_count = 0
     differences = []
     price_differences = []
+    rozetka_offer_ids = set()  # Індекс price_offer_id для O(1) пошуку supplier_only
 
     for rz_id, rz_data in rozetka_items.items():
-        price_offer_id = rz_data.get('price_offer_id')
+        price_offer_id = rz_data.price_offer_id
         if not price_offer_id:
             continue
+        rozetka_offer_ids.add(price_offer_id)
 
-        if price_offer_id in supplier_dict:
-            sup_data = supplier_dict[price_offer_id]
-            match = {
-                'id': rz_id,
-                'price_offer_id': price_offer_id,
-                'rozetka': {
-                    'price': rz_data['price'],
-                    'old_price': rz_data['price_old'],
-                    'available': rz_data['available'],
-                    'stock_quantity': rz_data['stock_quantity'],
-                    'name': rz_data.get('name', 'Невідома'),  # ФІКС: Додано з кешу
-                    'hierarchy': rz_data.get('hierarchy', []),  # ФІКС: Додано з кешу
-                    'brand': rz_data.get('brand', '-')  # ФІКС: Додано з кешу
-                },
-                'supplier': {
-                    'purchase_price': sup_data['purchase_price'],
-                    'supplier_price': sup_data['supplier_price'],
-                    'old_price': sup_data['old_price'],
-                    'available': sup_data['available'],
-                    'stock_quantity': sup_data['stock_quantity'],
-                    'is_rrp_fallback': sup_data.get('is_rrp_fallback', False)
-                },
-                'match': True
-            }
-            matches.append(match)
-
-            # Перевірка однаковості
-            if match['rozetka']['price'] == match['supplier']['supplier_price']:
-                same_price_count += 1
-            else:
-                delta = match['rozetka']['price'] - match['supplier']['supplier_price']
-                match['price_delta'] = delta
-                price_differences.append(match)
-
-            if match['rozetka']['old_price'] == match['supplier']['old_price']:
-                same_old_price_count += 1
-            if match['rozetka']['available'] == match['supplier']['available'] and match['rozetka']['stock_quantity'] == \
-                    match['supplier']['stock_quantity']:
-                same_available_count += 1
-
-            diffs = []
-            if match['rozetka']['price'] != match['supplier']['supplier_price']:
-                diffs.append(
-                    f"price: {match['rozetka']['price']} vs {match['supplier']['supplier_price']} (delta {delta:+.0f})")
-            if match['rozetka']['old_price'] != match['supplier']['old_price']:
-                diffs.append(f"old_price: {match['rozetka']['old_price']} vs {match['supplier']['old_price']}")
-            if match['rozetka']['available'] != match['supplier']['available'] or match['rozetka']['stock_quantity'] != \
-                    match['supplier']['stock_quantity']:
-                diffs.append(
-                    f"available/stock: {match['rozetka']['available']}/{match['rozetka']['stock_quantity']} vs {match['supplier']['available']}/{match['supplier']['stock_quantity']}")
-
-            if diffs:
-                match['differences'] = diffs
-                differences.append(match)
-        else:
+        sup_data = supplier_dict.get(price_offer_id)
+        if sup_data is None:
             rozetka_only.append((rz_id, price_offer_id))
+            continue
 
-    for sup_id in supplier_dict:
-        if sup_id not in [data.get('price_offer_id') for data in rozetka_items.values() if data.get('price_offer_id')]:
-            supplier_only.append(sup_id)
+        rz_price = rz_data.price
+        rz_old_price = rz_data.price_old
+        rz_available = rz_data.available
+        rz_stock = rz_data.stock_quantity
+        sup_price = sup_data.supplier_price
+        sup_old_price = sup_data.old_price
+        sup_available = sup_data.available
+        sup_stock = sup_data.stock_quantity
+
+        match = Match(rz_id, price_offer_id, rz_data, sup_data)
+        matches.append(match)
+
+        # Перевірка однаковості
+        price_differs = rz_price != sup_price
+        old_price_differs = rz_old_price != sup_old_price
+        stock_differs = rz_available != sup_available or rz_stock != sup_stock
+
+        if price_differs:
+            delta = rz_price - sup_price
+            match.price_delta = delta
+            price_differences.append(match)
+        else:
+            same_price_count += 1
+        if not old_price_differs:
+            same_old_price_count += 1
+        if not stock_differs:
+            same_available_count += 1
+
+        if price_differs or old_price_differs or stock_differs:
+            if with_differences:
+                diffs = []
+                if price_differs:
+                    diffs.append(f"price: {rz_price} vs {sup_price} (delta {delta:+.0f})")
+                if old_price_differs:
+                    diffs.append(f"old_price: {rz_old_price} vs {sup_old_price}")
+                if stock_differs:
+                    diffs.append(f"available/stock: {rz_available}/{rz_stock} vs {sup_available}/{sup_stock}")
+                match.differences = diffs
+            differences.append(match)
+
+    supplier_only = [sup_id for sup_id in supplier_dict if sup_id not in rozetka_offer_ids]
 
     logging.info(f"Співставлення по price_offer_id: {len(matches)} матчів")
     logging.info(
@@ -85,12 +85,14 @@ def match_and_compare(rozetka_items, supplier_dict):
     logging.info(f"Відмінності: {len(differences)} товарів, з них різниця в ціні: {len(price_differences)}")
 
     return matches, rozetka_only, supplier_only, differences, price_differences, same_price_count, same_old_price_count, same_available_count
+
+
 def get_differences_summary(differences):
     if not differences:
         return "Немає відмінностей"
     summary = {}
     for diff in differences:
-        for d in diff['differences']:
+        for d in diff.differences or []:
             if d not in summary:
                 summary[d] = 1
             else:
@@ -112,8 +114,11 @@ def get_profit_target(cost):
         return 1000
 
 
-def round_price(price, cost, my_profit_target, df_comm, hierarchy, brand, supplier_price):
-    """Округляє price до 9/49/99 залежно від типу, з перевіркою net >= target."""
+def round_price(price, cost, my_profit_target, df_comm, hierarchy, brand, supplier_price, steps=None):
+    """Округляє price до 9/49/99 залежно від типу, з перевіркою net >= target.
+
+    steps — список для кроків трейсу (core.price_trace) або None.
+    """
     from core.commissions import get_commission
 
     # Визначення ending і кроку
@@ -139,6 +144,8 @@ def round_price(price, cost, my_profit_target, df_comm, hierarchy, brand, suppli
     while True:
         comm = get_commission(df_comm, hierarchy, brand, rounded)
         net = rounded - cost - (rounded * comm / 100)
+        if steps is not None:
+            steps.append({'price': rounded, 'comm': comm, 'net': net})
         if net >= my_profit_target:
             break
         rounded += step  # Додаємо крок і повторюємо округлення
@@ -146,72 +153,176 @@ def round_price(price, cost, my_profit_target, df_comm, hierarchy, brand, suppli
     return max(rounded, supplier_price)
 
 
-def binary_search_price(cost, my_profit_target, df_comm, hierarchy, brand, supplier_price):
-    """Бінарний пошук найменшої ціни з net >= target."""
+def binary_search_price(cost, my_profit_target, df_comm, hierarchy, brand, supplier_price, steps=None):
+    """Бінарний пошук найменшої ціни з net >= target.
+
+    steps — список для кроків трейсу (core.price_trace) або None.
+    """
     from core.commissions import get_commission
 
     low = int(cost + my_profit_target)  # Мінімум
     high = 100000  # Максимум
-    iterations = []  # Лог
 
     while low < high:
         mid = (low + high) // 2
         comm = get_commission(df_comm, hierarchy, brand, mid)
         net = mid - cost - (mid * comm / 100)
 
-        iterations.append(f"{low}-{high}, mid={mid} net={net:.0f}")
+        if steps is not None:
+            steps.append({'low': low, 'high': high, 'mid': mid, 'comm': comm, 'net': net})
 
         if net >= my_profit_target:
             high = mid  # Можна нижче
         else:
             low = mid + 1  # Потрібно вище
 
-    iterations.append(
-        f"Фінал: {low} net={(low - cost - (low * get_commission(df_comm, hierarchy, brand, low) / 100)):.0f}")
-    base_price = max(low, supplier_price)  # Анти-демпінг
-    return base_price, '; '.join(iterations[:10]) + '...' if len(iterations) > 10 else '; '.join(
-        iterations)  # Короткий лог
+    return max(low, supplier_price)  # Анти-демпінг
+
+
+def _commission_segments(df_comm, hierarchy, brand, start):
+    """Відрізки цілих цін [lo, hi] від start, на яких комісія стала (hi=None — до нескінченності)."""
+    breakpoints = df_comm.price_breakpoints(hierarchy, brand)
+    lo = start
+    for point in breakpoints[bisect_right(breakpoints, start):]:
+        yield lo, point - 1
+        lo = point
+    yield lo, None
 
 
-def calculate_new_prices(matches, df_comm):
-    """Розраховує рекомендації: бінарний пошук + округлення + old_price логіка."""
+def solve_min_price(cost, my_profit_target, df_comm, hierarchy, brand, start, step=1, high=None, steps=None):
+    """Найменша ціна start + k*step (< high) з net >= target, напряму по смугах комісії.
+
+    У межах смуги комісія c стала, тож p = (cost + target) / (1 - c/100), вирівняна на крок.
+    Повертає (ціна, комісія, кількість смуг) або (None, None, кількість смуг), якщо ціни немає.
+    steps — список для трейсу перевірених смуг або None.
+    """
     from core.commissions import get_commission
 
-    for match in matches:
-        rz_data = match['rozetka']
-        sup_data = match['supplier']
-        cost = sup_data['purchase_price']
-        supplier_price = sup_data['supplier_price']
-        supplier_old_price = sup_data['old_price']
-        is_rrp_fallback = sup_data['is_rrp_fallback']
-        rozetka_price = rz_data['price']
-        hierarchy = rz_data.get('hierarchy', [])
-        brand = rz_data.get('brand', '-')
-
-        my_profit_target = get_profit_target(cost)
-
-        # RRP чек
-        comm_rrp = get_commission(df_comm, hierarchy, brand, supplier_price)
-        rrp_net = supplier_price - cost - (supplier_price * comm_rrp / 100)
-        used_rrp = False
-        if rrp_net > my_profit_target:
-            base_price = supplier_price
-            net_profit = rrp_net
-            comm_used = comm_rrp
-            iterations_log = "Використано RRP (вигідніше)"
-            used_rrp = True
+    def net(p, comm):
+        return p - cost - (p * comm / 100)
+
+    checked = 0
+    for seg_lo, seg_hi in _commission_segments(df_comm, hierarchy, brand, start):
+        if high is not None:
+            if seg_lo >= high:
+                break
+            seg_hi = high - 1 if seg_hi is None else min(seg_hi, high - 1)
+        checked += 1
+        comm = get_commission(df_comm, hierarchy, brand, seg_lo)
+        if comm >= 100:
+            if steps is not None:
+                steps.append({'seg_lo': seg_lo, 'seg_hi': seg_hi, 'comm': comm, 'price': None})
+            continue
+
+        need = math.ceil((cost + my_profit_target) / (1 - comm / 100))
+        p = max(seg_lo, need)
+        p = start + math.ceil((p - start) / step) * step
+        # Корекція похибки float: перевіряємо тією ж формулою, що й пошук
+        while p - step >= seg_lo and net(p - step, comm) >= my_profit_target:
+            p -= step
+        while (seg_hi is None or p <= seg_hi) and net(p, comm) < my_profit_target:
+            p += step
+        found = seg_hi is None or p <= seg_hi
+        if steps is not None:
+            steps.append({'seg_lo': seg_lo, 'seg_hi': seg_hi, 'comm': comm, 'price': p if found else None})
+        if found:
+            return p, comm, checked
+
+    return None, None, checked
+
+
+def closed_form_price(cost, my_profit_target, df_comm, hierarchy, brand, supplier_price, steps=None):
+    """Аналог binary_search_price без ітерацій по ціні: мінімум по смугах комісії."""
+    low = int(cost + my_profit_target)  # Мінімум
+    high = 100000  # Максимум
+
+    price = low
+    if low < high:
+        price, _, _ = solve_min_price(cost, my_profit_target, df_comm, hierarchy, brand, low, high=high, steps=steps)
+        if price is None:
+            price = high  # Немає ціни з net >= target
+    return max(price, supplier_price)  # Анти-демпінг
+
+
+def closed_form_round(price, cost, my_profit_target, df_comm, hierarchy, brand, supplier_price, steps=None):
+    """Аналог round_price: перший 9/99 вгору з net >= target, без кроку по 10/100."""
+    if price < 500:
+        step = 10
+        rounded = math.ceil(price / 10) * 10 - 1
+    else:
+        step = 100
+        rounded = math.ceil(price / 100) * 100 - 1
+
+    rounded, _, _ = solve_min_price(cost, my_profit_target, df_comm, hierarchy, brand, rounded, step=step, steps=steps)
+    return max(rounded, supplier_price)
+
+
+def price_memo_key(cost, supplier_price, hierarchy, brand, solver, commissions_fingerprint):
+    """Ключ мемо цін: хеш усього, від чого залежить розрахунок ціни (крім old_price — див. calculate_new_prices)."""
+    payload = json.dumps([PRICE_MEMO_VERSION, cost, supplier_price, hierarchy, brand, solver, commissions_fingerprint],
+                         ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def calculate_new_prices(matches, df_comm, solver='closed_form', memo=None, trace=None):
+    """Розраховує рекомендації: пошук мінімальної ціни + округлення + old_price логіка.
+
+    solver='closed_form' — розв'язок по смугах комісії (потрібен CommissionIndex),
+    solver='binary_search' — старий бінарний пошук з покроковим округленням (для A/B).
+    memo — utils.cache_manager.PriceMemo: ціни товарів з тими самими cost/RRP/ієрархією/брендом
+    і тією ж таблицею комісій беруться з нього, перераховуються лише змінені. old_price_recommended
+    (залежить від поточних цін) рахується щоразу — це дешево.
+    trace — core.price_trace.PriceTrace: кроки пошуку/округлення SKU, що трейсяться, пишуться у файл
+    трейсу (такі SKU завжди перераховуються, повз memo). Без trace кроки не збираються взагалі.
+    """
+    from core.commissions import get_commission, CommissionIndex
+
+    if solver == 'closed_form' and not isinstance(df_comm, CommissionIndex):
+        logging.warning("closed_form потребує CommissionIndex, використовуємо binary_search")
+        solver = 'binary_search'
+    if solver == 'closed_form':
+        search_price, finish_price = closed_form_price, closed_form_round
+    else:
+        search_price, finish_price = binary_search_price, round_price
+
+    keys = []
+    memoized = {}
+    if memo is not None:
+        fingerprint = getattr(df_comm, 'fingerprint', None)
+        if fingerprint is None:
+            logging.warning("Таблиця комісій без fingerprint — мемо цін не використовується")
+            memo = None
+        else:
+            keys = [price_memo_key(match.supplier.purchase_price, match.supplier.supplier_price,
+                                   match.rozetka.hierarchy, match.rozetka.brand,
+                                   solver, fingerprint) for match in matches]
+            memoized = memo.get_many(keys)
+
+    log_each = logging.getLogger().isEnabledFor(logging.DEBUG)  # Рядок на SKU — лише в DEBUG
+    reused = 0
+    for i, match in enumerate(matches):
+        rz_data = match.rozetka
+        sup_data = match.supplier
+        cost = sup_data.purchase_price
+        supplier_price = sup_data.supplier_price
+        supplier_old_price = sup_data.old_price
+        is_rrp_fallback = sup_data.is_rrp_fallback
+        rozetka_price = rz_data.price
+        hierarchy = rz_data.hierarchy
+        brand = rz_data.brand
+
+        steps = trace.steps_for(match) if trace is not None else None
+        priced = memoized.get(keys[i]) if memo is not None and steps is None else None
+        if priced is not None:
+            reused += 1
         else:
-            used_rrp = False
-            # БІНАРНИЙ ПОШУК
-            base_price, iterations_log = binary_search_price(cost, my_profit_target, df_comm, hierarchy, brand,
-                                                             supplier_price)
-            comm_used = get_commission(df_comm, hierarchy, brand, base_price)
-            net_profit = base_price - cost - (base_price * comm_used / 100)
-
-        # Округлення
-        final_price = round_price(base_price, cost, my_profit_target, df_comm, hierarchy, brand, supplier_price)
-        comm_final = get_commission(df_comm, hierarchy, brand, final_price)
-        net_final = final_price - cost - (final_price * comm_final / 100)
+            priced = _price_item(cost, supplier_price, df_comm, hierarchy, brand, search_price, finish_price,
+                                 get_commission, steps)
+            if memo is not None:
+                memo.put(keys[i], priced)
+            if steps is not None:
+                trace.write(match, steps, solver=solver, cost=cost, supplier_price=supplier_price, **priced)
+        final_price = priced['final_price']
 
         # Уточнена логіка old_price_recommended
         if final_price == rozetka_price:  # Не міняємо ціну для Rozetka
@@ -222,18 +333,73 @@ def calculate_new_prices(matches, df_comm):
         else:  # Міняємо ціну
             old_price_recommended = final_price * 1.2
 
-        match['recommendations'] = {
-            'final_price': round(final_price, 2),
-            'my_profit_target': round(my_profit_target, 2),
-            'net_profit': round(net_final, 2),
-            'comm_used': round(comm_final, 2),
-            'used_rrp': used_rrp,
-            'old_price_recommended': round(old_price_recommended, 2),
-            'base_price_before_round': round(base_price, 2),
-            'iterations_log': iterations_log  # НОВЕ: Лог ітерацій
-        }
-
-        logging.info(
-            f"ID {match['id']}: final={final_price}, old_rec={old_price_recommended} (fallback={is_rrp_fallback}), net={net_final}")
-
-    return matches
\ No newline at end of file
+        match.recommendations = Recommendation(
+            final_price=round(final_price, 2),
+            old_price_recommended=round(old_price_recommended, 2),
+            my_profit_target=round(priced['my_profit_target'], 2),
+            net_profit=round(priced['net_profit'], 2),
+            comm_used=round(priced['comm_used'], 2),
+            used_rrp=priced['used_rrp'],
+            base_price_before_round=round(priced['base_price'], 2),
+        )
+
+        if log_each:
+            logging.debug(
+                f"ID {match.id}: final={final_price}, old_rec={old_price_recommended} (fallback={is_rrp_fallback}), net={priced['net_profit']}")
+
+    if memo is not None:
+        memo.reused += reused
+        memo.recomputed += len(matches) - reused
+        memo.flush()
+        logging.info(f"Мемо цін: використано {reused}, перераховано {len(matches) - reused}")
+    return matches
+
+
+def _price_item(cost, supplier_price, df_comm, hierarchy, brand, search_price, finish_price, get_commission,
+                steps=None):
+    """Ціна одного товару (RRP чек, пошук мінімальної ціни, округлення) — частина, що мемоізується.
+
+    steps — {'search': [...], 'round': [...]} для трейсу або None.
+    """
+    my_profit_target = get_profit_target(cost)
+
+    # RRP чек
+    comm_rrp = get_commission(df_comm, hierarchy, brand, supplier_price)
+    rrp_net = supplier_price - cost - (supplier_price * comm_rrp / 100)
+    if rrp_net > my_profit_target:
+        base_price = supplier_price
+        used_rrp = True
+    else:
+        used_rrp = False
+        # ПОШУК МІНІМАЛЬНОЇ ЦІНИ
+        base_price = search_price(cost, my_profit_target, df_comm, hierarchy, brand, supplier_price,
+                                  None if steps is None else steps['search'])
+
+    # Округлення
+    final_price = finish_price(base_price, cost, my_profit_target, df_comm, hierarchy, brand, supplier_price,
+                               None if steps is None else steps['round'])
+    comm_final = get_commission(df_comm, hierarchy, brand, final_price)
+    net_final = final_price - cost - (final_price * comm_final / 100)
+    return {
+        'final_price': final_price,
+        'base_price': base_price,
+        'my_profit_target': my_profit_target,
+        'net_profit': net_final,
+        'comm_used': comm_final,
+        'used_rrp': used_rrp,
+    }
+
+# Колонки звіту recommendations.xlsx: внутрішня назва -> заголовок
+REPORT_COLUMNS = {
+    'id': 'ID на Rozetka',
+    'name': 'Назва товару',
+    'rozetka_price': 'Ціна на Rozetka зараз',
+    'rozetka_old_price': 'Стара ціна на Rozetka зараз',
+    'cost': 'Ціна закупки',
+    'supplier_price': 'RRP у постачальника',
+    'supplier_old_price': 'Стара ціна постачальника',
+    'final_price': 'Фінальна ціна',
+    'my_profit_target': 'Мій базовий профіт',
+    'net_profit': 'Мій реальний профіт',
+    'comm_used': 'Відсоток Rozetka',
+}
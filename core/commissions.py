@@ -1,17 +1,272 @@
-import pandas as pd
+import hashlib
+import os
+import pickle
 import logging
+from bisect import bisect_left
 
+COMMISSIONS_CACHE_FILE = "cache/commissions.pickle"  # Скомпільована таблиця: Excel читається лише після змін
+COMMISSIONS_CACHE_VERSION = 2  # Збільшити при зміні CommissionIndex — старий артефакт перебудується
 
-def load_commissions(excel_path='commissions.xlsx'):
+
+class CommissionIndex:
+    """Попередньо скомпільована таблиця комісій: (ID категорії, бренд) -> відсортовані діапазони цін.
+
+    Будується один раз у load_commissions, щоб get_commission не фільтрував DataFrame на кожен виклик.
+    У pickle таблиця зберігається списками по колонках, тож завантаження артефакту не імпортує pandas;
+    DataFrame (df) відновлюється лише на вимогу.
+    """
+
+    def __init__(self, df):
+        import pandas as pd
+
+        self._df = df
+        self._columns = None  # {колонка: список значень} — форма таблиці в pickle
+        self.rows = len(df)
+        self._schedules = {}
+        self._fingerprint = None
+        self.source = None  # 'excel' або 'artifact' — звідки завантажено в load_commissions
+        if df.empty:
+            return
+
+        grouped = {}
+        for cat_id, brand, range_str, percent in df[
+                ['ID категорії', 'Бренд', 'Діапазон цін', 'Відсоток комісії']].itertuples(index=False):
+            if pd.isna(cat_id) or not isinstance(brand, str):
+                continue  # Рядки без ID ніколи не співпадають з ієрархією
+            grouped.setdefault((float(cat_id), brand.lower()), []).append((range_str, float(percent)))
+
+        for key, rows in grouped.items():
+            self._schedules[key] = _compile_schedule(rows)
+
+        logging.info(f"Індекс комісій: {len(self._schedules)} ключів (категорія, бренд)")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_fingerprint'] = self.fingerprint
+        state['_columns'] = {column: self.df[column].tolist() for column in self.df.columns}
+        state['_df'] = None
+        return state
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def df(self):
+        if self._df is None:
+            import pandas as pd
+
+            self._df = pd.DataFrame(self._columns)
+        return self._df
+
+    @property
+    def empty(self):
+        return self.rows == 0
+
+    @property
+    def fingerprint(self):
+        """Хеш вмісту таблиці комісій — змінюється з будь-якою зміною рядків (для кешів цін)."""
+        if self._fingerprint is None:
+            import pandas as pd
+
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(repr(list(self.df.columns)).encode('utf-8'))
+            if not self.df.empty:
+                digest.update(pd.util.hash_pandas_object(self.df, index=False).values.tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def lookup_level(self, level_id, brand_lower, price):
+        """Комісія для одного рівня ієрархії (як _get_from_sub_df) або None."""
+        try:
+            schedule = self._schedules.get((level_id, brand_lower))
+        except TypeError:  # Нехешований ID
+            return None
+        if schedule is None:
+            return None
+        return _schedule_value(schedule, price)
+
+    def _chain_points(self, hierarchy, brand):
+        """Межі діапазонів з усіх рівнів ієрархії (для бренду і для '-')."""
+        brand_lower = str(brand).lower() if brand else '-'
+        keys = {'-', brand_lower}
+        points = set()
+        for level_name, level_id in hierarchy:
+            for key in keys:
+                try:
+                    schedule = self._schedules.get((level_id, key))
+                except TypeError:
+                    schedule = None
+                if schedule is not None:
+                    points.update(schedule[0])
+        return sorted(points)
+
+    def price_breakpoints(self, hierarchy, brand):
+        """Відсортовані цілі ціни, з яких комісія для ієрархії/бренду може змінитися."""
+        breakpoints = set()
+        for point in self._chain_points(hierarchy, brand):
+            breakpoints.add(point)
+            breakpoints.add(point + 1)  # Діапазон включний: наступна ціла ціна вже поза ним
+        return sorted(breakpoints)
+
+    def resolved_schedule(self, hierarchy, brand):
+        """Комісія як кусково-стала функція ціни: списки (starts, after, comms).
+
+        Смуга j діє з ціни starts[j] включно (або строго після неї, якщо after[j]) до наступної смуги.
+        Точна для будь-яких цін, зокрема дробових, бо межі діапазонів включні.
+        """
+        points = self._chain_points(hierarchy, brand)
+        starts = [float('-inf')]
+        after = [False]
+        comms = [self.lookup(hierarchy, brand, points[0] - 1 if points else 0)]
+        for i, point in enumerate(points):
+            next_point = points[i + 1] if i + 1 < len(points) else point + 1
+            starts += [point, point]
+            after += [False, True]
+            comms += [self.lookup(hierarchy, brand, point),
+                      self.lookup(hierarchy, brand, (point + next_point) / 2)]
+        return starts, after, comms
+
+    def lookup(self, hierarchy, brand, price):
+        brand_lower = str(brand).lower() if brand else '-'
+
+        for level_name, level_id in reversed(hierarchy):
+            # По ID + бренд (якщо не '-')
+            if brand_lower != '-':
+                comm = self.lookup_level(level_id, brand_lower, price)
+                if comm is not None:
+                    return comm
+
+            # Fallback по ID + бренд '-'
+            comm = self.lookup_level(level_id, '-', price)
+            if comm is not None:
+                return comm
+
+        logging.warning("Комісія не знайдена, дефолт 10%")
+        return 10.0
+
+
+def _compile_schedule(rows):
+    """Збирає (точки, значення в точках, значення між точками, базова комісія) для bisect.
+
+    Діапазони включні з обох боків; при перетині перемагає перший рядок, як у _get_from_sub_df.
+    """
+    base = None
+    intervals = []
+    for range_str, percent in rows:
+        if range_str == '-':
+            if base is None:
+                base = percent
+            continue
+        min_val, max_val = parse_range(range_str)
+        if min_val is not None:
+            intervals.append((min_val, max_val, percent))
+
+    points = sorted({v for min_val, max_val, _ in intervals for v in (min_val, max_val)})
+
+    def first_match(price):
+        for min_val, max_val, percent in intervals:
+            if min_val <= price <= max_val:
+                return percent
+        return None
+
+    point_values = [first_match(p) for p in points]
+    gap_values = [first_match((a + b) / 2) for a, b in zip(points, points[1:])]
+    return points, point_values, gap_values, base
+
+
+def _schedule_value(schedule, price):
+    points, point_values, gap_values, base = schedule
+    i = bisect_left(points, price)
+    comm = None
+    if i < len(points) and points[i] == price:
+        comm = point_values[i]
+    elif 0 < i < len(points):
+        comm = gap_values[i - 1]
+    return base if comm is None else comm
+
+
+def load_commissions(excel_path='commissions.xlsx', cache_file=COMMISSIONS_CACHE_FILE):
+    """CommissionIndex зі скомпільованого артефакту або, якщо commissions.xlsx змінився, з Excel.
+
+    Артефакт (pickle нормалізованої таблиці, розкладів діапазонів і fingerprint) валідний, поки збігаються
+    розмір і mtime файлу; при іншому mtime перевіряється хеш вмісту, тож просто збережена без змін таблиця
+    не перечитується. index.source — 'artifact' або 'excel'.
+    """
     try:
+        stat = os.stat(excel_path)
+    except OSError as e:
+        logging.error(f"Помилка читання Excel: {e}")
+        return _empty_index()
+
+    digest = None
+    artifact = _load_artifact(cache_file) if cache_file else None
+    if artifact is not None and artifact['size'] == stat.st_size:
+        index = artifact['index']
+        if artifact['mtime_ns'] == stat.st_mtime_ns:
+            return _from_artifact(index, cache_file)
+        digest = _excel_digest(excel_path)
+        if artifact['digest'] == digest:
+            _save_artifact(cache_file, index, stat, digest)  # Файл торкнули без змін — оновлюємо mtime
+            return _from_artifact(index, cache_file)
+
+    try:
+        import pandas as pd
+
         df = pd.read_excel(excel_path)
         df['Бренд'] = df['Бренд'].fillna('-')
         df['Діапазон цін'] = df['Діапазон цін'].fillna('-')
         logging.info(f"Завантажено {len(df)} рядків комісій")
-        return df
+        index = CommissionIndex(df)
     except Exception as e:
         logging.error(f"Помилка читання Excel: {e}")
-        return pd.DataFrame()
+        return _empty_index()
+
+    index.source = 'excel'
+    if cache_file:
+        _save_artifact(cache_file, index, stat, digest or _excel_digest(excel_path))
+    return index
+
+
+def _empty_index():
+    import pandas as pd
+
+    return CommissionIndex(pd.DataFrame())
+
+
+def _excel_digest(excel_path):
+    with open(excel_path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=20).hexdigest()
+
+
+def _load_artifact(cache_file):
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            artifact = pickle.load(f)
+        if artifact.get('version') == COMMISSIONS_CACHE_VERSION:
+            return artifact
+    except Exception as e:
+        logging.warning(f"Пошкоджений артефакт комісій {cache_file}: {e}")
+    return None
+
+
+def _save_artifact(cache_file, index, stat, digest):
+    artifact = {'version': COMMISSIONS_CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'digest': digest, 'index': index}
+    try:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        with open(f"{cache_file}.tmp", 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{cache_file}.tmp", cache_file)
+    except Exception as e:
+        logging.warning(f"Не вдалося зберегти артефакт комісій {cache_file}: {e}")
+
+
+def _from_artifact(index, cache_file):
+    index.source = 'artifact'
+    logging.info(f"Комісії з артефакту {cache_file}: {len(index)} рядків, fingerprint {index.fingerprint}")
+    return index
 
 
 def parse_range(range_str):
@@ -28,6 +283,9 @@ def get_commission(df, hierarchy, brand, price):
     if df.empty:
         return 10.0
 
+    if isinstance(df, CommissionIndex):
+        return df.lookup(hierarchy, brand, price)
+
     brand_lower = str(brand).lower() if brand else '-'
 
     for level_name, level_id in reversed(hierarchy):
@@ -0,0 +1,48 @@
+# core/price_trace.py
+# Опційний трейс розрахунку цін: кроки пошуку й округлення як структуровані записи, JSON Lines в окремий файл.
+# Вимкнений трейс нічого не коштує: функції пошуку отримують steps=None і не збирають нічого.
+import json
+import logging
+import os
+
+PRICE_TRACE_FILE = "output/price_trace.jsonl"
+
+
+class PriceTrace:
+    """Трейс цін на прогін: усі SKU або лише sku_ids (ID Rozetka чи price_offer_id).
+
+    steps_for(match) повертає dict зі списками 'search'/'round' для кроків або None, якщо SKU не трейситься;
+    write(...) дописує один JSON-рядок на SKU. Файл перезаписується на кожен прогін.
+    """
+
+    def __init__(self, path=PRICE_TRACE_FILE, sku_ids=None):
+        self.path = path
+        self.sku_ids = {str(sku_id) for sku_id in sku_ids} if sku_ids else None
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logging.info(f"Трейс цін: {self.count} SKU у {self.path}")
+
+    def steps_for(self, match):
+        if self.sku_ids is not None and str(match.id) not in self.sku_ids \
+                and str(match.price_offer_id) not in self.sku_ids:
+            return None
+        return {'search': [], 'round': []}
+
+    def write(self, match, steps, **fields):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'w', encoding='utf-8')
+        record = {'id': match.id, 'price_offer_id': match.price_offer_id, **fields, **steps}
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self.count += 1
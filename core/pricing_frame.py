@@ -0,0 +1,161 @@
+# core/pricing_frame.py
+# Векторний (numpy/pandas) розрахунок рекомендацій для всього каталогу — окремо від core.calculations,
+# щоб скалярний розрахунок і CLI-команди без нього не імпортували numpy/pandas.
+import logging
+
+import numpy as np
+import pandas as pd
+
+
+def matches_to_frame(matches):
+    """Перетворює список матчів з match_and_compare у колонковий DataFrame для calculate_prices_frame."""
+    rz = [m.rozetka for m in matches]
+    sup = [m.supplier for m in matches]
+    return pd.DataFrame({
+        'id': [m.id for m in matches],
+        'price_offer_id': [m.price_offer_id for m in matches],
+        'name': [r.name for r in rz],
+        'rozetka_price': [r.price for r in rz],
+        'rozetka_old_price': [r.price_old for r in rz],
+        'hierarchy': [r.hierarchy for r in rz],
+        'brand': [r.brand for r in rz],
+        'cost': [s.purchase_price for s in sup],
+        'supplier_price': [s.supplier_price for s in sup],
+        'supplier_old_price': [s.old_price for s in sup],
+        'is_rrp_fallback': [s.is_rrp_fallback for s in sup],
+        'available': [s.available for s in sup],
+        'stock_quantity': [s.stock_quantity for s in sup],
+    })
+
+
+def get_profit_target_vec(cost):
+    """Векторна версія get_profit_target (ті самі межі, включно з проміжками між тирами)."""
+    return np.select(
+        [cost < 3000,
+         (cost >= 3000) & (cost <= 3999),
+         (cost >= 4000) & (cost <= 5999),
+         (cost >= 6000) & (cost <= 7999)],
+        [np.maximum(cost * 0.20, 100), 500, 600, 700],
+        default=1000).astype(float)
+
+
+def _schedule_arrays(frame, df_comm):
+    """Розв'язує розклад комісій один раз на унікальну пару (ієрархія, бренд) і вирівнює в масиви (n, K)."""
+    key_codes = {}
+    codes = np.empty(len(frame), dtype=np.intp)
+    for i, (h, b) in enumerate(zip(frame['hierarchy'].tolist(), frame['brand'].tolist())):
+        key = (tuple(level_id for _, level_id in h), str(b).lower() if b else '-')
+        codes[i] = key_codes.setdefault(key, len(key_codes))
+
+    schedules = []
+    for level_ids, brand_lower in key_codes:
+        hierarchy = [(None, level_id) for level_id in level_ids]
+        schedules.append(df_comm.resolved_schedule(hierarchy, brand_lower))
+
+    width = max(len(s[0]) for s in schedules)
+    starts = np.full((len(schedules), width), np.inf)
+    after = np.zeros((len(schedules), width), dtype=bool)
+    comms = np.full((len(schedules), width), np.nan)
+    for i, (s, a, c) in enumerate(schedules):
+        starts[i, :len(s)] = s
+        after[i, :len(a)] = a
+        comms[i, :len(c)] = c
+
+    # Діапазон цілих цін кожної смуги: "після x" для цілих означає з x + 1
+    lo = np.where(after, np.floor(starts) + 1, starts)
+    hi = np.concatenate([lo[:, 1:] - 1, np.full((len(schedules), 1), np.inf)], axis=1)
+    hi = np.where(np.isinf(starts) & (starts > 0), -np.inf, hi)  # Порожні (доповнені) смуги
+    return starts[codes], after[codes], comms[codes], lo[codes], hi[codes]
+
+
+def _lookup_vec(price, starts, after, comms):
+    """Комісія для кожної ціни з її розкладу (аналог get_commission)."""
+    p = price[:, None]
+    active = (starts < p) | ((starts == p) & ~after)
+    idx = active.sum(axis=1) - 1
+    return comms[np.arange(len(price)), idx]
+
+
+def _solve_min_price_vec(start, step, high, cost, target, comms, lo, hi):
+    """Векторна версія solve_min_price: перша ціна start + k*step < high з net >= target (NaN — немає)."""
+    start_c, step_c, cost_c, target_c = (a[:, None] for a in (start, step, cost, target))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        seg_lo = np.maximum(lo, start_c)
+        seg_hi = np.minimum(hi, high - 1)
+        need = np.where(comms < 100, np.ceil((cost_c + target_c) / (1 - comms / 100)), np.inf)
+        p = np.maximum(seg_lo, need)
+        p = start_c + np.ceil((p - start_c) / step_c) * step_c
+
+        # Корекція похибки float тією ж формулою net, що й у скалярному пошуку
+        prev = p - step_c
+        p = np.where((prev >= seg_lo) & (prev - cost_c - prev * comms / 100 >= target_c), prev, p)
+        p = np.where(p - cost_c - p * comms / 100 < target_c, p + step_c, p)
+
+        valid = (p <= seg_hi) & (comms < 100) & (seg_lo <= seg_hi)
+    first = valid.argmax(axis=1)
+    return np.where(valid.any(axis=1), p[np.arange(len(start)), first], np.nan)
+
+
+def _round2(values):
+    """round(x, 2) по елементах, як у calculate_new_prices: np.round множить на 100 і округлює двійкове
+    значення, тож на межі .xx5 інколи дає інший цент."""
+    values = np.asarray(values, dtype=float)
+    return np.fromiter((round(value, 2) for value in values.tolist()), dtype=float, count=len(values))
+
+
+def calculate_prices_frame(frame, df_comm):
+    """Векторний розрахунок рекомендацій для всього каталогу (аналог calculate_new_prices).
+
+    Приймає колонки cost, supplier_price, supplier_old_price, rozetka_price, is_rrp_fallback,
+    hierarchy, brand (див. matches_to_frame) і повертає копію з колонками рекомендацій.
+    Потрібен CommissionIndex.
+    """
+    out = frame.copy()
+    if out.empty:
+        return out
+
+    cost = out['cost'].to_numpy(dtype=float)
+    supplier_price = out['supplier_price'].to_numpy(dtype=float)
+    supplier_old_price = pd.to_numeric(out['supplier_old_price'], errors='coerce').to_numpy(dtype=float)
+    rozetka_price = out['rozetka_price'].to_numpy(dtype=float)
+    is_rrp_fallback = out['is_rrp_fallback'].to_numpy(dtype=bool)
+    starts, after, comms, lo, hi = _schedule_arrays(out, df_comm)
+
+    my_profit_target = get_profit_target_vec(cost)
+
+    # RRP чек
+    comm_rrp = _lookup_vec(supplier_price, starts, after, comms)
+    rrp_net = supplier_price - cost - (supplier_price * comm_rrp / 100)
+    used_rrp = rrp_net > my_profit_target
+
+    # Мінімальна ціна на [cost + target, 100000)
+    high = 100000
+    low = np.trunc(cost + my_profit_target)
+    found = _solve_min_price_vec(low, np.ones_like(low), high, cost, my_profit_target, comms, lo, hi)
+    searched = np.where(low >= high, low, np.where(np.isnan(found), high, found))
+    base_price = np.where(used_rrp, supplier_price, np.maximum(searched, supplier_price))
+
+    # Округлення до 9/99 з перевіркою net >= target
+    step = np.where(base_price < 500, 10.0, 100.0)
+    rounded = np.ceil(base_price / step) * step - 1
+    rounded = _solve_min_price_vec(rounded, step, np.inf, cost, my_profit_target, comms, lo, hi)
+    final_price = np.maximum(rounded, supplier_price)
+    comm_final = _lookup_vec(final_price, starts, after, comms)
+    net_final = final_price - cost - (final_price * comm_final / 100)
+
+    # old_price_recommended (та ж логіка, що в calculate_new_prices)
+    has_old = ~np.isnan(supplier_old_price) & (supplier_old_price != 0)
+    same_price = final_price == rozetka_price
+    old_price_recommended = np.where(
+        same_price & ~is_rrp_fallback, supplier_old_price,
+        np.where(same_price & has_old, supplier_old_price * 1.2, final_price * 1.2))
+
+    out['final_price'] = _round2(final_price)
+    out['my_profit_target'] = _round2(my_profit_target)
+    out['net_profit'] = _round2(net_final)
+    out['comm_used'] = _round2(comm_final)
+    out['used_rrp'] = used_rrp
+    out['old_price_recommended'] = _round2(old_price_recommended)
+    out['base_price_before_round'] = _round2(base_price)
+    logging.info(f"Векторний розрахунок: {len(out)} товарів, RRP використано: {int(used_rrp.sum())}")
+    return out
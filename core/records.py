@@ -0,0 +1,64 @@
+# core/records.py
+# Компактні записи (__slots__) для товарів Rozetka, офферів постачальника, матчів і рекомендацій.
+# Замість вкладених dict на кожен товар — один об'єкт без __dict__, поля — атрибути.
+from dataclasses import dataclass, field, fields
+
+
+@dataclass(slots=True)
+class RozetkaItem:
+    """Товар Rozetka з кешу (поля — як колонки utils.cache_manager.ITEM_FIELDS + hierarchy)."""
+    name: str = 'Невідома'
+    price: float = 0
+    price_old: float = 0
+    commission_percent: float = 0
+    commission_sum: float = 0
+    brand: str = '-'
+    category_id: object = None
+    available: object = False
+    stock_quantity: int = 0
+    price_offer_id: str = None
+    hierarchy: list = field(default_factory=list)  # [(назва, id), ...] від root до leaf
+
+    @classmethod
+    def from_dict(cls, data):
+        """Зі старого dict-формату (JSON-кеш); невідомі ключі ігноруються."""
+        return cls(**{name: data[name] for name in _ROZETKA_FIELDS if name in data})
+
+
+@dataclass(slots=True)
+class SupplierOffer:
+    """Оффер постачальника після парсингу фіду; supplier — ім'я постачальника після злиття."""
+    purchase_price: float
+    supplier_price: float
+    old_price: float = None
+    available: str = 'false'
+    stock_quantity: int = 0
+    is_rrp_fallback: bool = False
+    supplier: str = None
+
+
+@dataclass(slots=True)
+class Recommendation:
+    """Результат calculate_new_prices для одного матчу."""
+    final_price: float
+    old_price_recommended: float
+    my_profit_target: float = None
+    net_profit: float = None
+    comm_used: float = None
+    used_rrp: bool = False
+    base_price_before_round: float = None
+
+
+@dataclass(slots=True)
+class Match:
+    """Співставлений товар: посилання на запис Rozetka і оффер постачальника (без копіювання полів)."""
+    id: str
+    price_offer_id: str
+    rozetka: RozetkaItem
+    supplier: SupplierOffer
+    recommendations: Recommendation = None
+    price_delta: float = None
+    differences: list = None
+
+
+_ROZETKA_FIELDS = tuple(item_field.name for item_field in fields(RozetkaItem))
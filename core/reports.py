@@ -0,0 +1,179 @@
+# core/reports.py
+# Експорт звітів (рекомендації, зміни фіду) без DataFrame.to_excel: рядки потоково йдуть у XLSX зі сталою
+# пам'яттю (XlsxWriter, якщо встановлено, інакше write-only openpyxl), CSV або Parquet.
+# ReportExporter пише їх у фоновому потоці, поки генерується фід.
+import csv
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from core.calculations import REPORT_COLUMNS
+
+REPORT_FORMATS = ('xlsx', 'csv', 'parquet')
+RECOMMENDATION_COLUMNS = tuple(REPORT_COLUMNS.values())
+CHANGES_COLUMNS = ('Offer ID', 'Назва товару', 'Зміни')
+PUSH_COLUMNS = ('Offer ID', 'Назва товару', 'Ціна', 'Стара ціна', 'Залишок', 'Результат')
+
+
+def short_name(name, limit=50):
+    return name[:limit] + '...' if len(name) > limit else name
+
+
+def recommendation_rows(matches):
+    """Рядки звіту рекомендацій (у порядку RECOMMENDATION_COLUMNS) з матчів після calculate_new_prices."""
+    for match in matches:
+        rec = match.recommendations
+        yield (
+            match.id,
+            short_name(match.rozetka.name),
+            match.rozetka.price,
+            match.rozetka.price_old,
+            match.supplier.purchase_price,
+            match.supplier.supplier_price,
+            match.supplier.old_price,
+            rec.final_price,
+            rec.my_profit_target,
+            rec.net_profit,
+            rec.comm_used,
+        )
+
+
+def change_rows(changes):
+    """Рядки звіту змін (CHANGES_COLUMNS) з FeedDiff.changes."""
+    for change in changes:
+        yield change['offer_id'], change['name'], '; '.join(change['changes'])
+
+
+def push_rows(offers, results):
+    """Рядки звіту push цін (PUSH_COLUMNS): offer_fields і результат push_prices по кожному офферу."""
+    for fields in offers:
+        error = results.get(str(fields['offer_id']), 'не надіслано')
+        yield (fields['offer_id'], short_name(fields.get('name') or ''), fields['price'], fields['oldprice'],
+               fields['stock_quantity'], 'OK' if error is None else error)
+
+
+def format_table(columns, rows):
+    """Текстова таблиця для консолі (як DataFrame.to_string(index=False), без pandas)."""
+    cells = [[str(column) for column in columns]]
+    cells += [['' if value is None else str(round(value, 2) if isinstance(value, float) else value) for value in row]
+              for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    return '\n'.join('  '.join(value.rjust(width) for value, width in zip(row, widths)) for row in cells)
+
+
+def _write_xlsx(path, columns, rows):
+    """XlsxWriter у constant_memory (рядок одразу на диск) або, без нього, write-only openpyxl."""
+    try:
+        import xlsxwriter
+    except ImportError:
+        return _write_xlsx_openpyxl(path, columns, rows)
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True})
+    try:
+        sheet = workbook.add_worksheet('Sheet1')
+        sheet.write_row(0, 0, columns)
+        count = 0
+        for count, row in enumerate(rows, 1):
+            sheet.write_row(count, 0, row)
+    finally:
+        workbook.close()
+    return count
+
+
+def _write_xlsx_openpyxl(path, columns, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(columns)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def _write_csv(path, columns, rows):
+    count = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:  # BOM — щоб Excel відкрив кирилицю
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_parquet(path, columns, rows):
+    import pandas as pd  # Parquet колонковий: рядки збираються в таблицю, рушій — pyarrow або fastparquet
+
+    df = pd.DataFrame.from_records(rows, columns=list(columns))
+    df.to_parquet(path, index=False)
+    return len(df)
+
+
+_WRITERS = {'xlsx': _write_xlsx, 'csv': _write_csv, 'parquet': _write_parquet}
+
+
+def write_report(path, columns, rows):
+    """Пише звіт у формат за розширенням path (.xlsx/.csv/.parquet), повертає кількість рядків.
+
+    Файл спершу пишеться поруч як .tmp і підміняється атомарно — незавершений звіт не видно.
+    """
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in _WRITERS:
+        raise ValueError(f"Невідомий формат звіту: {path} (підтримуються {', '.join(REPORT_FORMATS)})")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    try:
+        count = _WRITERS[fmt](tmp_file, columns, rows)
+        os.replace(tmp_file, path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return count
+
+
+class ReportExporter:
+    """Фоновий експорт звітів: submit(base_path, columns, rows) ставить запис у потік, wait() чекає всіх.
+
+    base_path без розширення пишеться в кожному з formats (напр. 'recommendations' -> recommendations.xlsx).
+    Генератор рядків при одному форматі читається у фоновому потоці, при кількох — спершу збирається в list.
+    Дані, з яких будуються рядки, не мають змінюватися до wait().
+    """
+
+    def __init__(self, formats=('xlsx',)):
+        unknown = set(formats) - set(REPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Невідомі формати звітів: {', '.join(sorted(unknown))}")
+        self.formats = tuple(formats)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reports')
+        self._jobs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._pool.shutdown(wait=True)
+
+    def submit(self, base_path, columns, rows):
+        if len(self.formats) > 1 and iter(rows) is rows:
+            rows = list(rows)
+        for fmt in self.formats:
+            path = f"{base_path}.{fmt}"
+            self._jobs.append((path, self._pool.submit(write_report, path, columns, rows)))
+
+    def wait(self):
+        """Чекає завершення всіх звітів, повертає {шлях: кількість рядків}; помилки логуються, не падають."""
+        written = {}
+        for path, future in self._jobs:
+            try:
+                written[path] = future.result()
+                logging.info(f"Звіт {path}: {written[path]} рядків")
+            except ImportError as e:
+                logging.warning(f"Звіт {path} не записано: {str(e).splitlines()[0]}")
+            except Exception as e:
+                logging.error(f"Помилка запису звіту {path}: {e}")
+        self._jobs = []
+        return written
@@ -1,28 +1,46 @@
 # Структура проекту: core/rozetka_api.py (виправлена версія)
 # Виправлення: 1) Обробка битого кешу (try/except на json.load). 2) Кеш ієрархії по unique cat_id (не для кожного товару). 3) Додано warning для битого кешу. 4) Оптимізовано: спочатку collect unique_cat_ids, потім batch hierarchy.
 
-import aiohttp
 import asyncio
 import json
 import os
 import base64
 import logging
+import sqlite3
+import time
+import uuid
 from datetime import datetime
 from collections import defaultdict
 
+from core.records import RozetkaItem
+from utils.cache_manager import ItemsCache, ITEM_FIELDS
+from utils.logger_setup import stage
+
 # Налаштування
 ROZETKA_AUTH_URL = "https://api-seller.rozetka.com.ua/sites"
 ROZETKA_BASE_URL = "https://api-seller.rozetka.com.ua"
 ROZETKA_USERNAME = "rgbtechhub"
 ROZETKA_PASSWORD = "123qwe123"
 TOKEN_FILE = "cache/token.json"
-CACHE_FILE = "cache/rozetka_cache.json"
-
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+CACHE_FILE = "cache/rozetka_cache.json"  # Старий JSON-кеш, лише для міграції
+CACHE_DB = "cache/rozetka_cache.sqlite"
+CATEGORY_CACHE_FILE = "cache/categories.json"
+CATEGORY_TTL_HOURS = 24 * 7  # Дерево категорій змінюється рідко
+ROZETKA_CONCURRENCY = 8  # Одночасних запитів до API
+ROZETKA_MAX_RETRIES = 3  # Повтори для 429/5xx
+ROZETKA_BACKOFF = 0.5  # Базова затримка повтору, с
+# Пряме оновлення цін/залишків (push_prices): шлях масового оновлення Seller API. Не задано, доки шлях,
+# поля price_update і формат відповіді (content.results) не звірено з документацією — push до того падає одразу
+ROZETKA_PRICE_UPDATE_PATH = None
+ROZETKA_PUSH_BATCH = 100  # Офферів в одному запиті
+ROZETKA_PUSH_RATE = 5.0  # Запитів на секунду (token bucket), з короткими сплесками до ROZETKA_PUSH_BURST
+ROZETKA_PUSH_BURST = 10
 
 
 async def login_to_rozetka():
     """Логін з base64-закодованим паролем, збереження токену."""
+    import aiohttp
+
     encoded_password = base64.b64encode(ROZETKA_PASSWORD.encode("utf-8")).decode("utf-8")
     payload = {"username": ROZETKA_USERNAME, "password": encoded_password}
     async with aiohttp.ClientSession() as session:
@@ -52,13 +70,177 @@ async def load_token():
     return None
 
 
+class TokenBucket:
+    """Обмежувач частоти: в середньому rate запитів/с, підряд — не більше capacity."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RozetkaClient:
+    """Клієнт Seller API з одним пулом з'єднань на весь прогін.
+
+    Повторює 429/5xx і мережеві помилки з експоненційною затримкою, сторінки /goods/on-sale
+    тягне паралельно (не більше concurrency запитів одночасно). rate_limit (запитів/с) вмикає
+    token bucket для кожної спроби запиту. base_url можна підмінити на локальний stub-сервер.
+    Не задані base_url, concurrency, max_retries і backoff беруться з констант модуля під час створення.
+    """
+
+    def __init__(self, token, base_url=None, concurrency=None, max_retries=None, backoff=None,
+                 rate_limit=None, burst=None):
+        self.token = token
+        self.base_url = (base_url or ROZETKA_BASE_URL).rstrip('/')
+        self.concurrency = ROZETKA_CONCURRENCY if concurrency is None else concurrency
+        self.max_retries = ROZETKA_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = ROZETKA_BACKOFF if backoff is None else backoff
+        self.request_count = 0
+        self.listing_complete = True  # False, якщо останній get_all_items обірвався (бита сторінка, < totalCount)
+        self._session = None
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+
+    async def __aenter__(self):
+        import aiohttp  # Лише для мережевих команд: кешовані не платять за імпорт
+
+        self._session = aiohttp.ClientSession(
+            headers={"Authorization": f"Bearer {self.token}", "Content-Language": "uk"},
+            connector=aiohttp.TCPConnector(limit=self.concurrency))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+
+    async def get_json(self, path, params=None):
+        """GET з повторами. Повертає (status, json) або (status, None), якщо відповідь не 200."""
+        return await self.request_json('GET', path, params=params)
+
+    async def request_json(self, method, path, params=None, payload=None, headers=None):
+        """Запит з повторами 429/5xx; (status, json) або (status, None), якщо відповідь не 2xx.
+
+        Повторюється той самий запит (тіло, заголовки), тож для змін стану він має бути ідемпотентним.
+        """
+        import aiohttp
+
+        url = f"{self.base_url}{path}"
+        target = f"{method} {path} {params}" if params else f"{method} {path}"
+        status = None
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * 2 ** attempt
+            try:
+                async with self._semaphore:
+                    if self._bucket is not None:
+                        await self._bucket.acquire()
+                    self.request_count += 1
+                    async with self._session.request(method, url, params=params, json=payload,
+                                                     headers=headers) as resp:
+                        status = resp.status
+                        if 200 <= status < 300:
+                            return status, await resp.json(content_type=None)
+                        if status != 429 and status < 500:
+                            return status, None
+                        retry_after = resp.headers.get("Retry-After")
+                        if retry_after and retry_after.isdigit():
+                            delay = int(retry_after)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"Помилка запиту {target}: {e}")
+            if attempt < self.max_retries:
+                logging.warning(f"Повтор {target} через {delay:.1f} с (статус {status})")
+                await asyncio.sleep(delay)
+        return status, None
+
+    async def validate_token(self):
+        status, _ = await self.get_json("/goods/on-sale", {"page": 1, "pageSize": 1})
+        return status == 200
+
+    async def get_total_count(self):
+        status, data = await self.get_json("/goods/on-sale", {"page": 1, "pageSize": 1})
+        if data is not None:
+            meta = data.get("content", {}).get("_meta", {})
+            total = meta.get("totalCount", 0)
+            logging.info(f"Загальна кількість активних товарів: {total}")
+            return total
+        logging.error("Не вдалося отримати totalCount")
+        return 0
+
+    async def get_page(self, page, page_size):
+        """Товари однієї сторінки або None при помилці."""
+        status, data = await self.get_json("/goods/on-sale", {"page": page, "pageSize": page_size})
+        if data is None:
+            logging.error(f"Помилка на сторінці {page}: {status}")
+            return None
+        return data.get("content", {}).get("items", [])
+
+    async def get_all_items(self, page_size=100):
+        """Усі товари: totalCount, потім сторінки паралельно, склеєні в порядку сторінок."""
+        total = await self.get_total_count()
+        pages_count = -(-total // page_size)
+        pages = await asyncio.gather(*(self.get_page(page, page_size) for page in range(1, pages_count + 1)))
+
+        all_items = []
+        for items in pages:
+            if not items:  # Як і раніше: зупиняємось на першій порожній/битій сторінці
+                break
+            all_items.extend(items)
+        self.listing_complete = total > 0 and len(all_items) >= total
+        logging.info(f"Завантажено {len(all_items)}/{total} товарів з {pages_count} сторінок")
+        if total and not self.listing_complete:
+            logging.warning(f"Лістинг неповний: {len(all_items)} з {total} товарів")
+        return all_items
+
+    async def push_batch(self, updates, path):
+        """Один пакет оновлень (див. price_update); {price_offer_id: None — успіх, або текст помилки}.
+
+        Значення абсолютні, а Idempotency-Key однаковий для всіх спроб, тож повтор пакета безпечний.
+        Результати по товарах — з content.results відповіді; без них статус пакета застосовується до всіх.
+        """
+        ids = [update['price_offer_id'] for update in updates]
+        status, data = await self.request_json('PUT', path, payload={'items': updates},
+                                               headers={'Idempotency-Key': uuid.uuid4().hex})
+        if data is None:
+            return {offer_id: f"HTTP {status}" for offer_id in ids}
+        if data.get('success') is False and not (data.get('content') or {}).get('results'):
+            error = str(data.get('errors') or data.get('message') or 'success=false')
+            return {offer_id: error for offer_id in ids}
+
+        results = dict.fromkeys(ids)
+        for item in (data.get('content') or {}).get('results', []):
+            offer_id = str(item.get('price_offer_id'))
+            if offer_id in results and not item.get('success', True):
+                results[offer_id] = str(item.get('error') or 'помилка')
+        return results
+
+    async def get_category_by_id(self, cat_id):
+        if not cat_id:
+            return None
+        status, data = await self.get_json("/market-categories/search",
+                                           {"category_id": cat_id, "page": 1, "pageSize": 1})
+        if data is not None:
+            categories = data.get("content", {}).get("marketCategorys", [])
+            if categories:
+                return categories[0]
+        logging.warning(f"Не вдалося отримати категорію ID {cat_id}")
+        return None
+
+
 async def validate_token(token):
     """Валідація токену через тестовий запит."""
-    url = f"{ROZETKA_BASE_URL}/goods/on-sale?page=1&pageSize=1"
-    headers = {"Authorization": f"Bearer {token}", "Content-Language": "uk"}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            return resp.status == 200
+    async with RozetkaClient(token) as client:
+        return await client.validate_token()
 
 
 async def get_valid_token():
@@ -79,66 +261,24 @@ async def get_valid_token():
 
 async def get_total_count(token):
     """Швидкий запит на загальну кількість товарів."""
-    url = f"{ROZETKA_BASE_URL}/goods/on-sale"
-    headers = {"Authorization": f"Bearer {token}", "Content-Language": "uk"}
-    params = {"page": 1, "pageSize": 1}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers, params=params) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                meta = data.get("content", {}).get("_meta", {})
-                total = meta.get("totalCount", 0)
-                logging.info(f"Загальна кількість активних товарів: {total}")
-                return total
-    logging.error("Не вдалося отримати totalCount")
-    return 0
+    async with RozetkaClient(token) as client:
+        return await client.get_total_count()
 
 
 async def get_all_items(token, page_size=100):
-    """Повний парсинг товарів з пагінацією."""
-    total = await get_total_count(token)
-    all_items = []
-    page = 1
-    while len(all_items) < total:
-        url = f"{ROZETKA_BASE_URL}/goods/on-sale"
-        headers = {"Authorization": f"Bearer {token}", "Content-Language": "uk"}
-        params = {"page": page, "pageSize": page_size}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    items = data.get("content", {}).get("items", [])
-                    if not items:
-                        break
-                    all_items.extend(items)
-                    logging.info(f"Сторінка {page}: {len(items)} товарів (всього {len(all_items)}/{total})")
-                    page += 1
-                else:
-                    logging.error(f"Помилка на сторінці {page}: {resp.status}")
-                    break
-    return all_items
+    """Повний парсинг товарів з пагінацією (сторінки паралельно)."""
+    async with RozetkaClient(token) as client:
+        return await client.get_all_items(page_size)
 
 
 async def get_category_by_id(token, cat_id):
     """Отримання однієї категорії за ID."""
-    if not cat_id:
-        return None
-    url = f"{ROZETKA_BASE_URL}/market-categories/search"
-    headers = {"Authorization": f"Bearer {token}", "Content-Language": "uk"}
-    params = {"category_id": cat_id, "page": 1, "pageSize": 1}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers, params=params) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                categories = data.get("content", {}).get("marketCategorys", [])
-                if categories:
-                    return categories[0]
-    logging.warning(f"Не вдалося отримати категорію ID {cat_id}")
-    return None
+    async with RozetkaClient(token) as client:
+        return await client.get_category_by_id(cat_id)
 
 
-async def get_category_hierarchy(token, cat_id, max_depth=10):
-    """Повна ієрархія від leaf до root."""
+async def _walk_hierarchy(cat_id, fetch_category, max_depth=10):
+    """Підйом від leaf до root через fetch_category(id) -> dict категорії або None."""
     if not cat_id:
         return []
     hierarchy = []
@@ -149,7 +289,7 @@ async def get_category_hierarchy(token, cat_id, max_depth=10):
             logging.warning(f"Цикл в ієрархії від {cat_id}")
             break
         visited.add(current_id)
-        cat = await get_category_by_id(token, current_id)
+        cat = await fetch_category(current_id)
         if not cat:
             break
         hierarchy.append((cat.get("name"), current_id))
@@ -160,6 +300,83 @@ async def get_category_hierarchy(token, cat_id, max_depth=10):
     return list(reversed(hierarchy))  # Від root до leaf
 
 
+async def get_category_hierarchy(token, cat_id, max_depth=10, client=None):
+    """Повна ієрархія від leaf до root (client — спільний RozetkaClient, якщо є)."""
+    if client:
+        return await _walk_hierarchy(cat_id, client.get_category_by_id, max_depth)
+    return await _walk_hierarchy(cat_id, lambda current_id: get_category_by_id(token, current_id), max_depth)
+
+
+class CategoryTree:
+    """Мемоізоване дерево категорій: id -> (name, parent_id), спільне для всіх leaf-категорій.
+
+    Кожен вузол запитується в API щонайбільше один раз: паралельні підйоми від різних leaf
+    чекають на той самий запит до спільного предка. Вузли зберігаються на диск з часом запиту
+    і застарівають поодинці: вузол, старший за TTL, при наступному прогоні запитується знову.
+    """
+
+    def __init__(self, client, cache_file=CATEGORY_CACHE_FILE, ttl_hours=CATEGORY_TTL_HOURS):
+        self.client = client
+        self.cache_file = cache_file
+        self.ttl_hours = ttl_hours
+        self.nodes = {}  # str(id) -> {"name": ..., "parent_id": ..., "fetched": час запиту (ISO)}
+        self.fetched = 0
+        self._pending = {}  # str(id) -> asyncio.Task з запитом до API
+
+    def load(self):
+        """Підтягує з диска вузли, запитані не раніше ніж TTL тому (старий формат — за часом файлу)."""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            file_time = data.get('timestamp', '2020-01-01T00:00:00')
+            now = datetime.now()
+            nodes = data.get('nodes', {})
+            for key, node in nodes.items():
+                fetched = datetime.fromisoformat(node.get('fetched', file_time))
+                if (now - fetched).total_seconds() / 3600 < self.ttl_hours:
+                    self.nodes[key] = dict(node, fetched=fetched.isoformat())
+            logging.info(f"Дерево категорій з кешу: {len(self.nodes)} вузлів "
+                         f"(застаріло {len(nodes) - len(self.nodes)})")
+        except Exception as e:
+            logging.warning(f"Помилка завантаження кешу категорій: {e}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'nodes': self.nodes, 'timestamp': datetime.now().isoformat()}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+
+    async def _fetch(self, key, cat_id):
+        cat = await self.client.get_category_by_id(cat_id)
+        self.fetched += 1
+        if cat:
+            self.nodes[key] = {"name": cat.get("name"), "parent_id": cat.get("parent_id"),
+                               "fetched": datetime.now().isoformat()}
+        return cat
+
+    async def get_category(self, cat_id):
+        key = str(cat_id)
+        if key in self.nodes:
+            return self.nodes[key]
+        task = self._pending.get(key)
+        if task is None:  # Невдалі запити теж запам'ятовуються, але лише на цей прогін
+            task = self._pending[key] = asyncio.ensure_future(self._fetch(key, cat_id))
+        return await task
+
+    async def hierarchy(self, cat_id, max_depth=10):
+        return await _walk_hierarchy(cat_id, self.get_category, max_depth)
+
+    async def resolve_all(self, cat_ids):
+        """Ієрархії для всіх leaf-категорій паралельно: {cat_id: [(name, id), ...]}."""
+        cat_ids = list(cat_ids)
+        hierarchies = await asyncio.gather(*(self.hierarchy(cat_id) for cat_id in cat_ids))
+        logging.info(f"Ієрархії для {len(cat_ids)} категорій: {self.fetched} запитів, {len(self.nodes)} вузлів у дереві")
+        return dict(zip(cat_ids, hierarchies))
+
+
 def extract_brand(item):
     """Витяг бренду з товару."""
     brand = item.get('price_producer_name') or item.get('rz_producer', {}).get('name', 'Unknown')
@@ -171,88 +388,219 @@ def extract_brand(item):
     return brand
 
 
-async def build_items_cache(token, ttl_hours=24):
-    """Парсинг + кеш: повертає dict товарів, зберігає кеш."""
+def _item_data(item, hierarchies):
+    """Запис кешу (RozetkaItem) для одного товару з сирих даних API."""
+    cat_id = item.get('price_category_id')
+
+    # Присвої hierarchy з кешу
+    if cat_id and cat_id in hierarchies:
+        hierarchy = [(name, id_) for name, id_ in hierarchies[cat_id]]
+    else:
+        hierarchy = []
+
+    return RozetkaItem(
+        name=item.get('name') or item.get('name_ua') or 'Невідома',
+        price=item.get('price', 0),
+        price_old=item.get('price_old', 0),
+        commission_percent=item.get('commission_percent', 0),
+        commission_sum=item.get('commission_sum', 0),
+        brand=extract_brand(item),
+        category_id=cat_id,
+        available=item.get('available', False),
+        stock_quantity=item.get('stock_quantity', 0),
+        price_offer_id=item.get('price_offer_id'),
+        hierarchy=hierarchy,
+    )
+
+
+async def _resolve_hierarchies(client, cat_ids):
+    """Ієрархії для cat_ids через спільне дерево категорій (з дисковим кешем)."""
+    with stage('hierarchy') as counters:
+        tree = CategoryTree(client)
+        tree.load()
+        cached_nodes = len(tree.nodes)
+        hierarchies = await tree.resolve_all(cat_ids)
+        counters.update(categories=len(hierarchies), tree_cached=cached_nodes, api_requests=tree.fetched)
+    tree.save()
+    return hierarchies
+
+
+async def build_items_cache(token, ttl_hours=24, incremental=True, stats=None):
+    """Парсинг + кеш: повертає dict товарів, зберігає кеш.
+
+    incremental=True: коли кеш застарів, не перебудовує його з нуля, а звіряє з поточним
+    лістингом (див. _refresh_items_cache). Якщо передано stats (dict), туди пишуться
+    'http_requests' і 'items_cache' ('valid' | 'incremental' | 'full').
+    """
+    stats = {} if stats is None else stats
+    async with RozetkaClient(token) as client:
+        try:
+            return await _build_items_cache(client, ttl_hours, incremental, stats)
+        finally:
+            stats['http_requests'] = client.request_count
+
+
+def push_endpoint():
+    """Шлях масового оновлення цін; RuntimeError, поки ROZETKA_PRICE_UPDATE_PATH не задано."""
+    if not ROZETKA_PRICE_UPDATE_PATH:
+        raise RuntimeError("Push цін не налаштовано: задайте ROZETKA_PRICE_UPDATE_PATH (core/rozetka_api.py) "
+                           "і перевірте поля price_update за документацією Seller API")
+    return ROZETKA_PRICE_UPDATE_PATH
+
+
+def price_update(fields):
+    """Оновлення одного оффера для push_prices з offer_fields / FeedDiff.delta."""
+    return {
+        'price_offer_id': str(fields['offer_id']),
+        'price': fields['price'],
+        'price_old': fields['oldprice'],
+        'stock_quantity': fields['stock_quantity'],
+        'available': str(fields['available']).lower() == 'true',
+    }
+
+
+async def push_prices(token, offers, batch_size=ROZETKA_PUSH_BATCH, rate_limit=ROZETKA_PUSH_RATE,
+                      burst=ROZETKA_PUSH_BURST, base_url=None, stats=None, path=None):
+    """Надсилає ціну, стару ціну й залишок offers (offer_fields) пакетами напряму в Seller API.
+
+    Один пул з'єднань, не більше ROZETKA_CONCURRENCY запитів одночасно і rate_limit запитів/с.
+    Повертає {price_offer_id: None — успіх, або текст помилки}; stats (dict) — batches/ok/failed/http_requests.
+    path — шлях оновлення (за замовчуванням push_endpoint(), напр. інший для стабу).
+    """
+    path = path or push_endpoint()
+    updates = [price_update(fields) for fields in offers]
+    batches = [updates[i:i + batch_size] for i in range(0, len(updates), batch_size)]
+    results = {}
+    async with RozetkaClient(token, base_url, rate_limit=rate_limit, burst=burst) as client:
+        for outcome in await asyncio.gather(*(client.push_batch(batch, path) for batch in batches)):
+            results.update(outcome)
+        request_count = client.request_count
+
+    failed = sum(1 for error in results.values() if error is not None)
+    logging.info(f"Push цін: {len(results) - failed}/{len(results)} успішно, {len(batches)} пакетів, "
+                 f"{request_count} запитів")
+    if stats is not None:
+        stats.update(batches=len(batches), ok=len(results) - failed, failed=failed, http_requests=request_count)
+    return results
+
+
+def load_cached_items():
+    """Товари з локального кешу без запитів до API (для команд, що працюють з кешів); {} без кешу."""
+    if not os.path.exists(CACHE_DB):
+        logging.error(f"Кешу товарів {CACHE_DB} немає — спершу запустіть fetch")
+        return {}
+    with ItemsCache(CACHE_DB) as store:
+        meta = store.load_meta()
+        items = store.load_items()
+    logging.info(f"Кеш товарів: {len(items)} товарів станом на {meta.get('timestamp', '?')}")
+    return items
+
+
+async def _build_items_cache(client, ttl_hours, incremental, stats):
     os.makedirs('cache', exist_ok=True)
 
-    # Завантажити кеш (з обробкою помилок)
-    cache = {}
-    cache_valid = False
-    if os.path.exists(CACHE_FILE):
+    with ItemsCache(CACHE_DB) as store:
+        store.migrate_from_json(CACHE_FILE)
+
+        # Завантажити кеш (з обробкою помилок)
+        cached_items = {}
         try:
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-            cache_time = datetime.fromisoformat(cache.get('timestamp', '2020-01-01T00:00:00'))
+            meta = store.load_meta()
+            cache_time = datetime.fromisoformat(meta.get('timestamp', '2020-01-01T00:00:00'))
             if (datetime.now() - cache_time).total_seconds() / 3600 < ttl_hours:
-                total_cached = cache.get('total_count', 0)
-                current_total = await get_total_count(token)
+                total_cached = meta.get('total_count', 0)
+                current_total = await client.get_total_count()
                 if total_cached == current_total:
-                    cache_valid = True
                     logging.info(f"Кеш валідний: {total_cached} товарів")
+                    stats['items_cache'] = 'valid'
                     print(f"Парсинг завершено з кешу: {total_cached} товарів")
-                    return cache.get('items', {})
-        except json.JSONDecodeError as e:
-            logging.warning(f"Кеш биттий (JSON помилка): {e}. Робимо повний парсинг")
+                    return store.load_items()
+            if incremental:
+                cached_items = store.load_items()
+        except sqlite3.DatabaseError as e:
+            logging.warning(f"Кеш биттий (SQLite помилка): {e}. Робимо повний парсинг")
         except Exception as e:
             logging.warning(f"Помилка завантаження кешу: {e}. Робимо повний парсинг")
 
-    if not cache_valid:
+        if cached_items:
+            stats['items_cache'] = 'incremental'
+            return await _refresh_items_cache(client, store, cached_items)
+        stats['items_cache'] = 'full'
+
         # Повний парсинг
-        items_raw = await get_all_items(token)
+        items_raw = await client.get_all_items()
         items_dict = {}
-        unique_cat_ids = set()
-
-        # Спочатку collect unique cat_ids
-        for item in items_raw:
-            cat_id = item.get('price_category_id')
-            if cat_id:
-                unique_cat_ids.add(cat_id)
 
-        # Batch: побудова hierarchy для unique cat_ids
-        hierarchies = {}
-        for cat_id in unique_cat_ids:
-            hierarchy = await get_category_hierarchy(token, cat_id)
-            hierarchies[cat_id] = hierarchy
-            logging.info(f"Ієрархія для cat_id {cat_id}: {len(hierarchy)} рівнів")
+        # Спочатку collect unique cat_ids, потім hierarchy для кожного один раз
+        unique_cat_ids = {item.get('price_category_id') for item in items_raw if item.get('price_category_id')}
+        hierarchies = await _resolve_hierarchies(client, unique_cat_ids)
 
         # Тепер для товарів
         for item in items_raw:
             rz_id = item.get('rz_item_id')
             if not rz_id:
                 continue
-            cat_id = item.get('price_category_id')
-
-            # Базові дані
-            item_data = {
-                'name': item.get('name') or item.get('name_ua') or 'Невідома',
-                'price': item.get('price', 0),
-                'price_old': item.get('price_old', 0),
-                'commission_percent': item.get('commission_percent', 0),
-                'commission_sum': item.get('commission_sum', 0),
-                'brand': extract_brand(item),
-                'category_id': cat_id,
-                'available': item.get('available', False),
-                'stock_quantity': item.get('stock_quantity', 0),
-                'price_offer_id': item.get('price_offer_id')
-            }
-
-            # Присвої hierarchy з кешу
-            if cat_id and cat_id in hierarchies:
-                item_data['hierarchy'] = [(name, id_) for name, id_ in hierarchies[cat_id]]
-            else:
-                item_data['hierarchy'] = []
-
-            items_dict[rz_id] = item_data
-
-        # Зберегти кеш
-        cache_data = {
-            'items': items_dict,
-            'total_count': len(items_dict),
-            'timestamp': datetime.now().isoformat()
-        }
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
+            items_dict[str(rz_id)] = _item_data(item, hierarchies)  # Ключі кешу — рядки, як у load_items
 
+        store.replace_items(items_dict, datetime.now().isoformat())
         logging.info(f"Повний парсинг: {len(items_dict)} товарів, збережено кеш")
         print(f"Парсинг завершено: {len(items_dict)} товарів")
-        return items_dict
\ No newline at end of file
+        return items_dict
+
+
+async def _refresh_items_cache(client, store, cached_items):
+    """Інкрементне оновлення: звіряє лістинг з кешем, не чіпаючи незмінені товари.
+
+    Ієрархії беруться з кешованих товарів за category_id, запитуються лише нові категорії.
+    У сховище записуються тільки нові/змінені товари і видаляються зниклі. Неповний лістинг
+    (бита сторінка) нічого не видаляє і не зберігається: отримані товари накладаються на кеш
+    лише в пам'яті, а наступний прогін звіряє кеш знову.
+    """
+    items_raw = await client.get_all_items()
+    if not items_raw:
+        logging.warning("Лістинг Rozetka порожній, залишаємо кеш без змін")
+        return cached_items
+
+    hierarchies = {}
+    for data in cached_items.values():
+        if data.category_id and data.hierarchy:
+            hierarchies.setdefault(data.category_id, data.hierarchy)
+    new_cat_ids = {item.get('price_category_id') for item in items_raw
+                   if item.get('price_category_id') and item.get('price_category_id') not in hierarchies}
+    if new_cat_ids:
+        hierarchies.update(await _resolve_hierarchies(client, new_cat_ids))
+
+    items_dict = {}
+    updated = {}
+    added = 0
+    for item in items_raw:
+        rz_id = item.get('rz_item_id')
+        if not rz_id:
+            continue
+        key = str(rz_id)  # Ключі кешу — рядки
+        item_data = _item_data(item, hierarchies)
+        old_data = cached_items.get(key)
+        if old_data is None:
+            added += 1
+            updated[key] = item_data
+        elif any(getattr(old_data, field) != getattr(item_data, field) for field in ITEM_FIELDS):
+            updated[key] = item_data
+        else:
+            item_data = old_data
+        items_dict[key] = item_data
+
+    if not client.listing_complete:
+        logging.warning(f"Лістинг Rozetka неповний ({len(items_dict)} з {len(cached_items)} у кеші): "
+                        f"залишаємо кешовані товари, кеш не перезаписується")
+        print(f"Парсинг завершено (неповний лістинг): {len(items_dict)} з API, решта з кешу")
+        return {**cached_items, **items_dict}
+    removed = cached_items.keys() - items_dict.keys()
+
+    if updated or removed:
+        store.update_items(updated, removed, datetime.now().isoformat())
+        logging.info(f"Інкрементне оновлення: +{added}, змінено {len(updated) - added}, -{len(removed)}, збережено кеш")
+    else:
+        store.touch(datetime.now().isoformat())  # Кеш знову свіжий на ttl_hours
+        logging.info("Інкрементне оновлення: змін немає, оновлено лише час кешу")
+    print(f"Парсинг завершено (інкрементно): {len(items_dict)} товарів, нових категорій {len(new_cat_ids)}")
+    return items_dict
@@ -0,0 +1,226 @@
+# core/yml_generator.py
+import gzip
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from utils.logger_setup import prune_run_files
+
+SHOP_NAME = "My Shop"
+SHOP_COMPANY = "My Company"
+SHOP_URL = "https://myshop.ua"
+SNAPSHOT_FILE = "output/feed_snapshot.json"  # Стан offers останнього фіду для диффу без парсингу XML
+DELTA_XML = "output/rozetka_delta.xml"  # Лише змінені/нові offers відносно снапшоту
+MANIFEST_DIR = "output/manifests"
+MANIFEST_KEEP = 200  # Скільки останніх маніфестів зберігати (демон пише маніфест на кожен перерахунок)
+
+
+def offer_fields(match):
+    """Дані одного <offer> з матчу (після calculate_new_prices)."""
+    return {
+        'offer_id': match.price_offer_id,
+        'available': match.supplier.available,
+        'price': match.recommendations.final_price,
+        'oldprice': match.recommendations.old_price_recommended,
+        'stock_quantity': match.supplier.stock_quantity,
+        'name': match.rozetka.name,
+    }
+
+
+def _header(date):
+    return (
+        "<?xml version='1.0' encoding='utf-8'?>\n"
+        f"<yml_catalog date={quoteattr(date)}><shop>"
+        f"<name>{escape(SHOP_NAME)}</name>"
+        f"<company>{escape(SHOP_COMPANY)}</company>"
+        f"<url>{escape(SHOP_URL)}</url>"
+        '<currencies><currency id="UAH" rate="1" /></currencies>'
+        '<categories><category id="1">Default</category></categories>'
+        "<offers>"
+    )
+
+
+def _offer_xml(fields):
+    return (
+        f"<offer id={quoteattr(str(fields['offer_id']))} available={quoteattr(str(fields['available']))}>"
+        f"<price>{fields['price']}</price>"
+        f"<oldprice>{fields['oldprice']}</oldprice>"
+        "<currencyId>UAH</currencyId>"
+        "<categoryId>1</categoryId>"
+        f"<stock_quantity>{fields['stock_quantity']}</stock_quantity>"
+        f"<name>{escape(str(fields['name']))}</name>"
+        "</offer>"
+    )
+
+
+def write_rozetka_yml(matches, output_file, gzip_output=None, on_offer=None):
+    """Потоково пише YML для Rozetka з ітератора матчів, повертає кількість offers.
+
+    on_offer(fields) викликається для кожного записаного offer (напр. FeedDiff.add).
+    """
+    return write_offers_yml((offer_fields(match) for match in matches), output_file, gzip_output, on_offer)
+
+
+def write_offers_yml(offers, output_file, gzip_output=None, on_offer=None):
+    """Потоково пише YML з ітератора offer_fields-словників, повертає кількість offers.
+
+    Файл пишеться у тимчасовий поруч і атомарно перейменовується, тож споживач ніколи
+    не бачить напівзаписаний фід. gzip_output=None — стиснення, якщо output_file закінчується на .gz.
+    """
+    if gzip_output is None:
+        gzip_output = output_file.endswith('.gz')
+    out_dir = os.path.dirname(output_file) or '.'
+    os.makedirs(out_dir, exist_ok=True)
+
+    fd, tmp_file = tempfile.mkstemp(dir=out_dir, prefix='.yml-', suffix='.tmp')
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            stream = gzip.GzipFile(fileobj=raw, mode='wb') if gzip_output else raw
+            try:
+                write = stream.write
+                write(_header(datetime.now().strftime("%Y-%m-%d %H:%M")).encode('utf-8'))
+                for fields in offers:
+                    write(_offer_xml(fields).encode('utf-8'))
+                    if on_offer is not None:
+                        on_offer(fields)
+                    count += 1
+                write(b"</offers></shop></yml_catalog>")
+            finally:
+                if gzip_output:
+                    stream.close()
+        os.chmod(tmp_file, 0o644)  # mkstemp створює 0600
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+
+    logging.info(f"YML записано: {output_file} ({count} offers{', gzip' if gzip_output else ''})")
+    return count
+
+
+def snapshot_state(price, oldprice, available, stock_quantity):
+    """Компактний стан offer у снапшоті: [price, oldprice, available, stock_quantity]."""
+    return [float(price or 0), float(oldprice or 0), str(available), int(stock_quantity or 0)]
+
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """{offer_id: [price, oldprice, available, stock_quantity]} або None, якщо снапшоту ще немає."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('offers', {})
+    except Exception as e:
+        logging.warning(f"Не вдалося прочитати снапшот {path}: {e}")
+        return None
+
+
+def save_snapshot(offers, path=SNAPSHOT_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'offers': offers, 'timestamp': datetime.now().isoformat()}, f, ensure_ascii=False,
+                  separators=(',', ':'))
+    os.replace(tmp_file, path)
+
+
+class FeedDiff:
+    """Дифф попереднього і нового фіду, що збирається під час запису (без повторного парсингу XML).
+
+    changes — список {'offer_id', 'name', 'changes': [рядки], 'fields': {поле: (старе, нове)}}
+    для offers, що є в обох фідах; added/removed — offer_id, що з'явились/зникли;
+    delta — offer_fields змінених і нових offers (для дельта-фіду), після finish() — і зниклих, знятих
+    з продажу (available="false", stock_quantity 0); snapshot — новий стан.
+    """
+
+    FIELDS = ('price', 'oldprice', 'available', 'stock_quantity')
+
+    def __init__(self, previous):
+        self.previous = previous
+        self.snapshot = {}
+        self.changes = []
+        self.added = []
+        self.delta = []
+
+    def add(self, fields):
+        offer_id = str(fields['offer_id'])
+        state = snapshot_state(fields['price'], fields['oldprice'], fields['available'], fields['stock_quantity'])
+        self.snapshot[offer_id] = state
+
+        old_state = self.previous.get(offer_id)
+        if old_state is None:
+            self.added.append(offer_id)
+            self.delta.append(fields)
+            return
+
+        changed = {field: (old, new) for field, old, new in zip(self.FIELDS, old_state, state) if old != new}
+        if changed:
+            self.delta.append(fields)
+            name = str(fields['name'])
+            self.changes.append({
+                "offer_id": offer_id,
+                "name": name[:50] + "..." if len(name) > 50 else name,
+                "changes": [f"{field}: {old} → {new}" for field, (old, new) in changed.items()],
+                "fields": changed,
+            })
+
+    def finish(self):
+        """Після останнього add: додає в delta зниклі offers як зняті з продажу, повертає їх кількість."""
+        removed = self.removed
+        for offer_id in removed:
+            price, oldprice = self.previous[offer_id][:2]
+            self.delta.append({'offer_id': offer_id, 'available': 'false', 'price': price, 'oldprice': oldprice,
+                               'stock_quantity': 0, 'name': ''})
+        return len(removed)
+
+    def requeue(self, offer_ids):
+        """Повертає offers у snapshot до попереднього стану, тож наступний дифф знову покаже їх зміненими
+        (напр. push, який API не прийняло)."""
+        for offer_id in map(str, offer_ids):
+            if offer_id in self.previous:
+                self.snapshot[offer_id] = self.previous[offer_id]
+            else:
+                self.snapshot.pop(offer_id, None)
+
+    @property
+    def removed(self):
+        return [offer_id for offer_id in self.previous if offer_id not in self.snapshot]
+
+
+def write_delta_feed(feed_diff, full_feed, full_count, delta_file=DELTA_XML, manifest_dir=MANIFEST_DIR,
+                     keep_manifests=MANIFEST_KEEP):
+    """Пише дельта-YML (змінені/нові offers і, після FeedDiff.finish, зняті) і маніфест прогону, повертає маніфест.
+
+    У manifest_dir зберігаються лише keep_manifests останніх маніфестів (None — усі).
+    """
+    delta_count = write_offers_yml(feed_diff.delta, delta_file)
+    removed = feed_diff.removed
+    field_counts = {}
+    for change in feed_diff.changes:
+        for field in change['fields']:
+            field_counts[field] = field_counts.get(field, 0) + 1
+
+    run_time = datetime.now()
+    manifest = {
+        'timestamp': run_time.isoformat(),
+        'full_feed': full_feed,
+        'full_count': full_count,
+        'delta_feed': delta_file,
+        'delta_count': delta_count,
+        'changed': len(feed_diff.changes),
+        'added': len(feed_diff.added),
+        'removed': removed,
+        'changed_fields': field_counts,
+    }
+    os.makedirs(manifest_dir, exist_ok=True)
+    manifest_file = os.path.join(manifest_dir, f"run-{run_time.strftime('%Y%m%d-%H%M%S-%f')}.json")
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    logging.info(f"Дельта-фід: {delta_count} з {full_count} offers, маніфест {manifest_file}")
+    if keep_manifests:
+        prune_run_files(manifest_dir, keep_manifests)
+    return manifest
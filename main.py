@@ -1,23 +1,57 @@
-import asyncio
+# Точка входу: python main.py [команда] — див. cli(). Без команди — повний прогін (run).
+# Важкі залежності (pandas, aiohttp, модулі core/parsers) імпортуються лише командами, яким вони потрібні.
+import argparse
+import importlib
 import logging
-import pandas as pd
-import time
-import xml.etree.ElementTree as ET
-from datetime import datetime
 import os  # Для роботи з файлами
+import sys
+import time
 
-from core.rozetka_api import get_valid_token, build_items_cache
-from core.commissions import load_commissions
-from parsers.gamepro_parsers import parse_gamepro
-from core.calculations import match_and_compare, calculate_new_prices
+from utils.logger_setup import RUN_REPORT_DIR, RunProfiler, setup_logging, stage
 
 # Налаштування шляхів
 OUTPUT_XML = "output/rozetka_optimized.xml"  # ФІКС: Додаємо папку output/
 OLD_XML = "output/rozetka_optimized_old.xml"  # Для збереження старого XML
+WRITE_DELTA_FEED = True  # Додатково писати output/rozetka_delta.xml лише зі зміненими offers
+VECTORIZED_PRICING = False  # True — векторний розрахунок усього каталогу (без логу ітерацій)
+PRICE_MEMO_DB = "cache/price_memo.sqlite"  # Мемо цін: перераховуються лише товари зі зміненими вхідними даними
+PRICE_TRACE = False  # True — кроки пошуку/округлення всіх SKU в output/price_trace.jsonl
+PRICE_TRACE_SKUS = []  # Або лише ці SKU (ID Rozetka / price_offer_id), напр. ['U0001234']
+PROFILE_STAGES = []  # Етапи під профайлером, напр. ['pricing', 'catalog/hierarchy'] -> output/profiles
+PROFILER = 'cprofile'  # 'cprofile' (.prof) або 'pyinstrument' (HTML, якщо встановлено)
+REPORT_FORMATS = ['xlsx']  # Формати звітів: 'xlsx', 'csv', 'parquet' (parquet — потрібен pyarrow)
+RECOMMENDATIONS_REPORT = "recommendations"  # Без розширення: + .xlsx/.csv/.parquet з REPORT_FORMATS
+CHANGES_REPORT = "output/changes"
+COMMISSIONS_XLSX = "commissions.xlsx"
+SUPPLIERS_CONFIG = "config.yaml"
+PUSH_PRICES = False  # True — після нового фіду надсилати змінені ціни/залишки напряму в Seller API
+PUSH_REPORT = "output/push_report"  # Результат push по кожному офферу (+ розширення з REPORT_FORMATS)
+DAEMON_POLL_INTERVAL = 60  # с: перевірка фідів (умовні запити), commissions.xlsx і config.yaml
+DAEMON_REPRICE_INTERVAL = 5 * 60  # с: плановий перерахунок, навіть якщо нічого не змінилося
+DAEMON_CATALOG_INTERVAL = 30 * 60  # с: оновлення каталогу Rozetka (інкрементне)
+
+
+def calculate_prices_report(matches, df_comm):
+    """Векторний розрахунок: повертає матчі з final_price/old_price для XML і готовий DataFrame звіту."""
+    from core.calculations import REPORT_COLUMNS
+    from core.pricing_frame import matches_to_frame, calculate_prices_frame
+    from core.records import Recommendation
+
+    prices = calculate_prices_frame(matches_to_frame(matches), df_comm)
+    for match, final_price, old_price_rec in zip(matches, prices['final_price'].tolist(),
+                                                 prices['old_price_recommended'].tolist()):
+        match.recommendations = Recommendation(final_price, old_price_rec)
+
+    df_rec = prices[list(REPORT_COLUMNS)].rename(columns=REPORT_COLUMNS)
+    names = df_rec['Назва товару'].astype(str)
+    df_rec['Назва товару'] = names.where(names.str.len() <= 50, names.str[:50] + '...')
+    return matches, df_rec
 
 
 def parse_xml_to_dict(xml_file):
     """Парсить XML у dict {offer_id: {price, oldprice, available, stock_quantity, name}}."""
+    import xml.etree.ElementTree as ET
+
     try:
         tree = ET.parse(xml_file)
         root = tree.getroot()
@@ -38,6 +72,14 @@ def parse_xml_to_dict(xml_file):
         return {}
 
 
+def snapshot_from_xml(xml_file):
+    """Снапшот стану offers з уже записаного XML (для першого запуску після оновлення)."""
+    from core.yml_generator import snapshot_state
+
+    return {offer_id: snapshot_state(data['price'], data['oldprice'], data['available'], data['stock_quantity'])
+            for offer_id, data in parse_xml_to_dict(xml_file).items()}
+
+
 def compare_xml_changes(old_xml, new_xml):
     """Порівнює старий і новий XML, повертає список змін."""
     old_dict = parse_xml_to_dict(old_xml)
@@ -69,66 +111,83 @@ def compare_xml_changes(old_xml, new_xml):
     return changes
 
 
-def generate_rozetka_xml(matches, output_file=OUTPUT_XML):
-    """Генерує XML/YML для Rozetka з рекомендаціями."""
+def generate_rozetka_xml(matches, output_file=OUTPUT_XML, on_offer=None):
+    """Генерує XML/YML для Rozetka з рекомендаціями (потоково, див. core.yml_generator)."""
+    from core.yml_generator import write_rozetka_yml
+
     # Копіюємо старий XML, якщо існує
     if os.path.exists(output_file):
         os.replace(output_file, OLD_XML)
         logging.info(f"Старий XML збережено як {OLD_XML}")
 
-    yml = ET.Element("yml_catalog", date=datetime.now().strftime("%Y-%m-%d %H:%M"))
-    shop = ET.SubElement(yml, "shop")
-    ET.SubElement(shop, "name").text = "My Shop"
-    ET.SubElement(shop, "company").text = "My Company"
-    ET.SubElement(shop, "url").text = "https://myshop.ua"
-    currencies = ET.SubElement(shop, "currencies")
-    ET.SubElement(currencies, "currency", id="UAH", rate="1")
-    categories = ET.SubElement(shop, "categories")
-    ET.SubElement(categories, "category", id="1").text = "Default"
-    offers = ET.SubElement(shop, "offers")
-
-    for match in matches:
-        price_offer_id = match['price_offer_id']
-        available = match['supplier']['available']
-        final_price = match['recommendations']['final_price']
-        old_price_rec = match['recommendations']['old_price_recommended']
-        stock_qty = match['supplier']['stock_quantity']
-        name = match['rozetka'].get('name', 'Невідома товар')
-
-        offer = ET.SubElement(offers, "offer", id=price_offer_id, available=available)
-        ET.SubElement(offer, "price").text = str(final_price)
-        ET.SubElement(offer, "oldprice").text = str(old_price_rec)
-        ET.SubElement(offer, "currencyId").text = "UAH"
-        ET.SubElement(offer, "categoryId").text = "1"
-        ET.SubElement(offer, "stock_quantity").text = str(stock_qty)
-        ET.SubElement(offer, "name").text = name
-
-    # ФІКС: Створюємо папку output, якщо не існує
-    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)  # '.' якщо dirname порожній
-    tree_out = ET.ElementTree(yml)
-    tree_out.write(output_file, encoding="utf-8", xml_declaration=True)
-    logging.info(f"XML створено: {output_file} ({len(matches)} offers)")
-    print(f"XML готовий: {output_file} з {len(matches)} оновленими offers (завантаж у Rozetka).")
-
-
-async def main():
-    token = await get_valid_token()
+    count = write_rozetka_yml(matches, output_file, on_offer=on_offer)
+    print(f"XML готовий: {output_file} з {count} оновленими offers (завантаж у Rozetka).")
+    return count
+
+
+def _hit_rate(hits, total):
+    return round(hits / total, 3) if total else None
+
+
+async def run_pipeline():
+    from core.rozetka_api import get_valid_token, build_items_cache
+    from parsers.supplier_loader import load_all_suppliers
+
+    with stage('token'):
+        token = await get_valid_token()
     if not token:
         logging.error("Не можемо продовжити без токену")
         return
 
     # Завантаження Excel
-    df_comm = load_commissions()
+    df_comm = load_commissions_stage()
 
     # Парсинг Rozetka
-    items_rozetka = await build_items_cache(token)
+    with stage('catalog') as counters:
+        catalog_stats = {}
+        items_rozetka = await build_items_cache(token, stats=catalog_stats)
+        counters.update(items=len(items_rozetka), **catalog_stats)
+
+    # Парсинг усіх постачальників з config (паралельно, зі злиттям)
+    with stage('suppliers') as counters:
+        run_stats = {}
+        items_supplier = await load_all_suppliers(SUPPLIERS_CONFIG, stats=run_stats)
+        parse_stats = run_stats.get('parse_cache') or {}
+        counters.update(offers=len(items_supplier), parse_cache_hits=parse_stats.get('hits', 0),
+                        parse_cache_hit_rate=_hit_rate(parse_stats.get('hits', 0),
+                                                       parse_stats.get('hits', 0) + parse_stats.get('misses', 0)),
+                        fallback=len(run_stats.get('fallback') or []))
+
+    matches = match_stage(items_rozetka, items_supplier)
+    if parse_stats:
+        print(f"Кеш парсингу фідів: {parse_stats['hits']} влучань, {parse_stats['misses']} промахів "
+              f"(записів {parse_stats['entries']}, витіснено {parse_stats['evictions']})")
+
+    if matches:
+        updated_matches, df_rec = pricing_stage(matches, df_comm)
+        feed_diff = export_stage(updated_matches, df_rec)
+        if PUSH_PRICES:
+            await push_delta_stage(feed_diff, token)
+
+
+def load_commissions_stage(excel_path=COMMISSIONS_XLSX):
+    from core.commissions import load_commissions
 
-    # Парсинг GamePro з config
-    items_supplier = parse_gamepro()
+    with stage('commissions') as counters:
+        df_comm = load_commissions(excel_path)
+        counters.update(rows=len(df_comm), source=df_comm.source, fingerprint=df_comm.fingerprint)
+    return df_comm
+
+
+def match_stage(items_rozetka, items_supplier):
+    """Співставлення і статистика; повертає список матчів."""
+    from core.calculations import match_and_compare
 
     # Співставлення
-    matches, rozetka_only, supplier_only, differences, price_differences, same_price_count, same_old_price_count, same_available_count = match_and_compare(
-        items_rozetka, items_supplier)
+    with stage('matching') as counters:
+        matches, rozetka_only, supplier_only, differences, price_differences, same_price_count, same_old_price_count, same_available_count = match_and_compare(
+            items_rozetka, items_supplier)
+        counters.update(matches=len(matches), rozetka_only=len(rozetka_only), supplier_only=len(supplier_only))
 
     # СТАТИСТИКА СПІВСТАВЛЕННЯ
     total_matches = len(matches)
@@ -143,72 +202,484 @@ async def main():
 
     print(f"Тільки в Rozetka: {len(rozetka_only)}")
     print(f"Тільки в постачальнику: {len(supplier_only)}")
+    return matches
+
+
+def pricing_stage(matches, df_comm):
+    """Розрахунок рекомендацій; повертає (матчі з рекомендаціями, DataFrame звіту або None)."""
+    from core.calculations import calculate_new_prices
+    from core.price_trace import PriceTrace
+    from utils.cache_manager import PriceMemo
 
     # РОЗРАХУНОК РЕКОМЕНДАЦІЙ ЦІН
-    if total_matches > 0:
-        print("\n=== РОЗРАХУНОК РЕКОМЕНДАЦІЙ ЦІН ===")
-        start_time = time.perf_counter()
-        updated_matches = calculate_new_prices(matches, df_comm)
-        end_time = time.perf_counter()
-        processing_time = end_time - start_time
-        print(
-            f"Час обробки {total_matches} матчів: {processing_time:.2f} секунд ({processing_time / total_matches:.4f} сек/товар)")
-
-        # ГЕНЕРАЦІЯ EXCEL
-        rec_list = []
-        for match in updated_matches:
-            rec = match['recommendations']
-            name = match['rozetka'].get('name', 'Невідома')
-            rec_list.append({
-                'ID на Rozetka': match['id'],
-                'Назва товару': name[:50] + '...' if len(name) > 50 else name,
-                'Ціна на Rozetka зараз': match['rozetka']['price'],
-                'Стара ціна на Rozetka зараз': match['rozetka']['old_price'],
-                'Ціна закупки': match['supplier']['purchase_price'],
-                'RRP у постачальника': match['supplier']['supplier_price'],
-                'Стара ціна постачальника': match['supplier']['old_price'],
-                'Фінальна ціна': rec['final_price'],
-                'Мій базовий профіт': rec['my_profit_target'],
-                'Мій реальний профіт': rec['net_profit'],
-                'Відсоток Rozetka': rec['comm_used'],
-                'Ітерації': rec['iterations_log']
-            })
+    print("\n=== РОЗРАХУНОК РЕКОМЕНДАЦІЙ ЦІН ===")
+    df_rec = None
+    with stage('pricing') as counters:
+        counters['items'] = len(matches)
+        if VECTORIZED_PRICING:
+            updated_matches, df_rec = calculate_prices_report(matches, df_comm)
+        else:
+            trace = PriceTrace(sku_ids=PRICE_TRACE_SKUS) if PRICE_TRACE or PRICE_TRACE_SKUS else None
+            with PriceMemo(PRICE_MEMO_DB) as memo:
+                updated_matches = calculate_new_prices(matches, df_comm, memo=memo, trace=trace)
+            if trace is not None:
+                trace.close()
+                print(f"Трейс цін: {trace.count} SKU у {trace.path}")
+            print(f"Ціни: перераховано {memo.recomputed}, з мемо {memo.reused}")
+            counters.update(recomputed=memo.recomputed, memo_hits=memo.reused,
+                            memo_hit_rate=_hit_rate(memo.reused, len(matches)))
+    return updated_matches, df_rec
+
+
+def _frame_rows(df):
+    """Рядки DataFrame звіту як кортежі, NaN -> None (порожня клітинка)."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
 
-        df_rec = pd.DataFrame(rec_list)
-        df_rec.to_excel('recommendations.xlsx', index=False, engine='openpyxl')
-        print(f"\nРекомендації збережено в recommendations.xlsx ({len(rec_list)} товарів)")
+def export_stage(updated_matches, df_rec=None, write_feed=True):
+    """Звіти (у фоновому потоці) і, якщо write_feed, новий фід з диффом відносно попереднього.
+
+    Повертає FeedDiff відносно попереднього фіду (для push_delta_stage) або None без нього.
+    """
+    from core.reports import (ReportExporter, recommendation_rows, change_rows, format_table,
+                              RECOMMENDATION_COLUMNS, CHANGES_COLUMNS)
+
+    # ЗВІТИ: пишуться у фоновому потоці, поки генерується фід
+    with ReportExporter(REPORT_FORMATS) as reports:
+        if df_rec is not None:
+            preview = list(_frame_rows(df_rec.head(10)))
+            report_rows = _frame_rows(df_rec)
+        else:
+            preview = list(recommendation_rows(updated_matches[:10]))
+            report_rows = recommendation_rows(updated_matches)
+        reports.submit(RECOMMENDATIONS_REPORT, RECOMMENDATION_COLUMNS, report_rows)
         print("Вивід топ-10:")
-        print(df_rec.head(10).to_string(index=False))
-
-        # НОВЕ: Порівняння старого і нового XML
-        print("\n=== ПОРІВНЯННЯ XML ===")
-        xml_start = time.perf_counter()
-        generate_rozetka_xml(updated_matches)  # Створює новий XML
-        if os.path.exists(OLD_XML):
-            changes = compare_xml_changes(OLD_XML, OUTPUT_XML)
+        print(format_table(RECOMMENDATION_COLUMNS, preview))
+
+        feed_diff = None
+        if write_feed:
+            changes, feed_diff = feed_stage(updated_matches)
             if changes:
-                print(f"\nЗмінено {len(changes)} товарів:")
-                for i, change in enumerate(changes[:3]):
-                    print(f"\n{i + 1}. Offer ID: {change['offer_id']}, Назва: {change['name']}")
-                    print(f"   Зміни: {', '.join(change['changes'])}")
-                    print("   ---")
                 # Додаємо збереження змін у changes.xlsx
-                changes_df = pd.DataFrame([
-                    {
-                        'Offer ID': change['offer_id'],
-                        'Назва товару': change['name'],
-                        'Зміни': '; '.join(change['changes'])
-                    } for change in changes
-                ])
-                changes_df.to_excel('output/changes.xlsx', index=False, engine='openpyxl')
-                print(f"Список змін збережено в output/changes.xlsx ({len(changes)} товарів)")
+                reports.submit(CHANGES_REPORT, CHANGES_COLUMNS, change_rows(changes))
+
+        # Чекаємо лише хвіст запису звітів, що не встиг за час генерації фіду
+        with stage('reports') as counters:
+            written = reports.wait()
+            counters['files'] = len(written)
+    for path, count in written.items():
+        what = "Список змін" if path.startswith(CHANGES_REPORT) else "Рекомендації"
+        print(f"{what} збережено в {path} ({count} товарів)")
+    return feed_diff
+
+
+def feed_stage(updated_matches):
+    """Новий XML, снапшот і дельта-фід; повертає (зміни, FeedDiff або None без попереднього снапшоту)."""
+    from core.yml_generator import write_delta_feed, FeedDiff, load_snapshot, save_snapshot, DELTA_XML
+
+    # НОВЕ: Порівняння старого і нового XML
+    print("\n=== ПОРІВНЯННЯ XML ===")
+    changes, pushable = [], None
+    with stage('feed') as counters:
+        previous = load_snapshot()
+        bootstrapped = previous is None and os.path.exists(OUTPUT_XML)
+        if bootstrapped:
+            # Одноразова міграція зі старого XML: він може бути застарілим або з іншого каталогу
+            logging.warning(f"Снапшоту немає — базовий стан взято з {OUTPUT_XML}; дельта-фід і push пропущено "
+                            f"на цьому запуску")
+            previous = snapshot_from_xml(OUTPUT_XML)
+        feed_diff = FeedDiff(previous or {})
+        full_count = generate_rozetka_xml(updated_matches, on_offer=feed_diff.add)  # Створює новий XML і дифф
+        removed = feed_diff.finish()  # Зниклі offers — у дельту як зняті з продажу
+        counters.update(offers=full_count, changed=len(feed_diff.changes), added=len(feed_diff.added),
+                        removed=removed)
+        save_snapshot(feed_diff.snapshot)
+        if previous is not None:
+            if WRITE_DELTA_FEED and not bootstrapped:
+                manifest = write_delta_feed(feed_diff, OUTPUT_XML, full_count)
+                print(f"Дельта-фід: {DELTA_XML} з {manifest['delta_count']} з {full_count} offers "
+                      f"(змінено {manifest['changed']}, нових {manifest['added']}, зникло {len(manifest['removed'])})")
+            changes, pushable = feed_diff.changes, None if bootstrapped else feed_diff
+            logging.info(f"Знайдено {len(changes)} змінених товарів у XML")
+            if changes:
+                print_changes(changes)
             else:
                 print("\nЗмін у XML немає — все однакове!")
         else:
-            print(f"\nСтарий XML ({OLD_XML}) відсутній — перший запуск")
-        xml_end = time.perf_counter()
-        print(f"\nЧас генерації XML і порівняння: {xml_end - xml_start:.2f} секунд")
+            print("\nПопереднього фіду немає — перший запуск")
+    return changes, pushable
+
+
+async def push_stage(offers, token=None):
+    """Ціни/залишки offers напряму в Seller API (push_prices) і звіт PUSH_REPORT з результатом по кожному."""
+    from core.rozetka_api import get_valid_token, push_prices
+    from core.reports import write_report, push_rows, PUSH_COLUMNS
+
+    if token is None:
+        with stage('token'):
+            token = await get_valid_token()
+        if not token:
+            logging.error("Немає токену — ціни не надіслано")
+            return {}
+
+    with stage('push') as counters:
+        push_stats = {}
+        results = await push_prices(token, offers, stats=push_stats)
+        counters.update(offers=len(offers), **push_stats)
+    print(f"Push цін: {push_stats['ok']} з {len(results)} оновлено, помилок {push_stats['failed']}")
+    for fmt in REPORT_FORMATS:
+        path = f"{PUSH_REPORT}.{fmt}"
+        try:
+            count = write_report(path, PUSH_COLUMNS, push_rows(offers, results))
+            print(f"Результат push збережено в {path} ({count} товарів)")
+        except ImportError as e:
+            logging.warning(f"Звіт {path} не записано: {str(e).splitlines()[0]}")
+    return results
+
+
+async def push_delta_stage(feed_diff, token=None):
+    """push_stage для дельти фіду (feed_diff з export_stage; None — нічого не надсилати).
+
+    Снапшот уже збережено з новим станом, тож offers, які API не прийняло (або які не надіслано,
+    напр. без токену), повертаються в ньому до попереднього стану: наступний прогін покаже їх
+    зміненими і надішле знову.
+    """
+    from core.yml_generator import save_snapshot
+
+    if feed_diff is None or not feed_diff.delta:
+        return {}
+    results = await push_stage(feed_diff.delta, token)
+    failed = [fields['offer_id'] for fields in feed_diff.delta
+              if results.get(str(fields['offer_id']), 'не надіслано') is not None]
+    if failed:
+        feed_diff.requeue(failed)
+        save_snapshot(feed_diff.snapshot)
+        logging.warning(f"Push: {len(failed)} offers не прийнято — буде повтор у наступному прогоні")
+    return results
+
+
+def print_changes(changes, limit=3):
+    print(f"\nЗмінено {len(changes)} товарів:")
+    for i, change in enumerate(changes[:limit]):
+        print(f"\n{i + 1}. Offer ID: {change['offer_id']}, Назва: {change['name']}")
+        print(f"   Зміни: {', '.join(change['changes'])}")
+        print("   ---")
+
+
+# === CLI ===
+
+def _price_from_caches():
+    """Матчі з рекомендаціями лише з локальних кешів (товари, фіди, комісії), без мережі."""
+    from core.rozetka_api import load_cached_items
+    from parsers.supplier_loader import load_cached_suppliers
+
+    df_comm = load_commissions_stage()
+    with stage('catalog') as counters:
+        items_rozetka = load_cached_items()
+        counters.update(items=len(items_rozetka), items_cache='local')
+    with stage('suppliers') as counters:
+        items_supplier, missing = load_cached_suppliers(SUPPLIERS_CONFIG)
+        counters.update(offers=len(items_supplier), missing=len(missing))
+    if not items_rozetka or not items_supplier:
+        logging.error("Немає кешованих товарів або фідів — спершу fetch і parse-supplier")
+        return None, None
+
+    matches = match_stage(items_rozetka, items_supplier)
+    if not matches:
+        return None, None
+    return pricing_stage(matches, df_comm)
+
+
+def cmd_run(args):
+    import asyncio
+
+    asyncio.run(run_pipeline())
+
+
+def cmd_fetch(args):
+    import asyncio
+    from core.rozetka_api import get_valid_token, build_items_cache
+
+    async def fetch():
+        with stage('token'):
+            token = await get_valid_token()
+        if not token:
+            logging.error("Не можемо продовжити без токену")
+            return
+        with stage('catalog') as counters:
+            catalog_stats = {}
+            items_rozetka = await build_items_cache(token, stats=catalog_stats)
+            counters.update(items=len(items_rozetka), **catalog_stats)
+        print(f"Товарів Rozetka у кеші: {len(items_rozetka)} ({catalog_stats.get('items_cache')})")
+
+    asyncio.run(fetch())
+
+
+def cmd_parse_supplier(args):
+    import asyncio
+    from parsers.supplier_loader import load_all_suppliers
+
+    with stage('suppliers') as counters:
+        run_stats = {}
+        items_supplier = asyncio.run(load_all_suppliers(args.config, stats=run_stats))
+        counters.update(offers=len(items_supplier), fallback=len(run_stats.get('fallback') or []),
+                        **(run_stats.get('parse_cache') or {}))
+    print(f"Офферів постачальників: {len(items_supplier)}")
+
+
+def cmd_price(args):
+    updated_matches, df_rec = _price_from_caches()
+    if updated_matches:
+        export_stage(updated_matches, df_rec, write_feed=False)
+
+
+def cmd_export_feed(args):
+    import asyncio
+
+    updated_matches, df_rec = _price_from_caches()
+    if updated_matches:
+        feed_diff = export_stage(updated_matches, df_rec)
+        if PUSH_PRICES:
+            asyncio.run(push_delta_stage(feed_diff))
+
+
+def cmd_push(args):
+    import asyncio
+
+    offers = [dict(fields, offer_id=offer_id) for offer_id, fields in parse_xml_to_dict(args.file).items()]
+    if not offers:
+        logging.error(f"Немає offers для push у {args.file}")
+        return
+    asyncio.run(push_stage(offers))
+
+
+def cmd_diff(args):
+    from core.reports import write_report, change_rows, CHANGES_COLUMNS
+
+    with stage('diff') as counters:
+        changes = compare_xml_changes(args.old, args.new)
+        counters['changes'] = len(changes)
+    if not changes:
+        print("\nЗмін у XML немає — все однакове!")
+        return
+    print_changes(changes, limit=args.limit)
+    if args.report:
+        count = write_report(args.report, CHANGES_COLUMNS, change_rows(changes))
+        print(f"Список змін збережено в {args.report} ({count} товарів)")
+
+
+class RepriceDaemon:
+    """Режим демона: каталог Rozetka, комісії й розпарсені фіди живуть у пам'яті між циклами.
+
+    Кожні poll_interval секунд — опитування: фіди постачальників (умовні запити, незмінені не
+    парсяться і не читаються з диска, див. ResidentOffers), mtime commissions.xlsx і config.yaml
+    (змінені перечитуються на льоту), раз на catalog_interval — каталог Rozetka. Перерахунок цін,
+    фід і звіти — коли щось змінилося або минув reprice_interval. JSON-звіт пишеться лише для
+    опитувань з перерахунком.
+    """
+
+    def __init__(self, poll_interval=DAEMON_POLL_INTERVAL, reprice_interval=DAEMON_REPRICE_INTERVAL,
+                 catalog_interval=DAEMON_CATALOG_INTERVAL):
+        from parsers.supplier_loader import ResidentOffers
+
+        self.poll_interval = poll_interval
+        self.reprice_interval = reprice_interval
+        self.catalog_interval = catalog_interval
+        self.items = None
+        self.offers = None
+        self.df_comm = None
+        self.resident = ResidentOffers()
+        self.reprices = 0
+        self._file_stats = {}
+        self._next_catalog = 0
+        self._next_reprice = 0
+
+    def _file_changed(self, path):
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        changed = path not in self._file_stats or self._file_stats[path] != signature
+        self._file_stats[path] = signature
+        return changed
+
+    async def refresh(self):
+        """Оновлює застарілий стан, повертає причини перерахунку (порожній список — нічого не змінилося)."""
+        from core.rozetka_api import get_valid_token, build_items_cache
+        from parsers.supplier_loader import load_all_suppliers
+
+        reasons = []
+        now = time.monotonic()
+        if self._file_changed(COMMISSIONS_XLSX) or self.df_comm is None:
+            self.df_comm = load_commissions_stage()
+            reasons.append('commissions')
+        if self._file_changed(SUPPLIERS_CONFIG):
+            reasons.append('config')
+
+        if self.items is None or now >= self._next_catalog:
+            with stage('token'):
+                token = await get_valid_token()
+            if token:
+                with stage('catalog') as counters:
+                    catalog_stats = {}
+                    items = await build_items_cache(token, stats=catalog_stats)
+                    counters.update(items=len(items), **catalog_stats)
+                if self.items is None or catalog_stats.get('items_cache') != 'valid':
+                    reasons.append('catalog')
+                self.items = items
+                self._next_catalog = now + self.catalog_interval
+            elif self.items is None:
+                logging.error("Немає токену і каталогу в пам'яті — пропускаємо опитування")
+                return []
+
+        with stage('suppliers') as counters:
+            self.offers = await load_all_suppliers(SUPPLIERS_CONFIG, resident=self.resident)
+            counters.update(offers=len(self.offers), changed=len(self.resident.changed))
+        if self.resident.changed:
+            reasons.append('feeds')
+        if now >= self._next_reprice:
+            reasons.append('schedule')
+        return reasons
+
+    async def poll(self):
+        with RunProfiler(profile_stages=PROFILE_STAGES, profiler=PROFILER, report_dir=None,
+                         command='daemon') as profiler:
+            reasons = await self.refresh()
+            if reasons and self.items and self.offers:
+                profiler.report_dir = RUN_REPORT_DIR  # Звіт лише для опитувань з перерахунком
+                logging.info(f"Перерахунок #{self.reprices + 1}: {', '.join(reasons)}")
+                matches = match_stage(self.items, self.offers)
+                if matches:
+                    updated_matches, df_rec = pricing_stage(matches, self.df_comm)
+                    feed_diff = export_stage(updated_matches, df_rec)
+                    if PUSH_PRICES:
+                        await push_delta_stage(feed_diff)
+                self.reprices += 1
+                self._next_reprice = time.monotonic() + self.reprice_interval
+        if profiler.report_dir:
+            profiler.print_summary()
+
+    async def run(self, max_polls=None):
+        """Опитування до SIGTERM/Ctrl+C (або max_polls); помилка одного опитування не зупиняє демона."""
+        import asyncio
+        import signal
+
+        stop = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, AttributeError):  # Windows
+            pass
+
+        polls = 0
+        while not stop.is_set():
+            try:
+                await self.poll()
+            except Exception as e:
+                logging.exception(f"Помилка циклу демона: {e}")
+            polls += 1
+            if max_polls and polls >= max_polls:
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        logging.info(f"Демон зупинено: {polls} опитувань, {self.reprices} перерахунків")
+
+
+def cmd_daemon(args):
+    import asyncio
+
+    daemon = RepriceDaemon(args.poll, args.reprice, args.catalog)
+    try:
+        asyncio.run(daemon.run(args.max_polls))
+    except KeyboardInterrupt:
+        logging.info("Демон зупинено (Ctrl+C)")
+
+
+# Команда -> (обробник, модулі, які вона імпортує; їх імпорт вимірюється етапом 'imports')
+COMMANDS = {
+    'run': (cmd_run, ('core.rozetka_api', 'parsers.supplier_loader', 'core.commissions', 'core.calculations',
+                      'core.reports', 'core.yml_generator', 'utils.cache_manager')),
+    'fetch': (cmd_fetch, ('core.rozetka_api',)),
+    'parse-supplier': (cmd_parse_supplier, ('parsers.supplier_loader',)),
+    'price': (cmd_price, ('core.rozetka_api', 'parsers.supplier_loader', 'core.commissions', 'core.calculations',
+                          'core.reports', 'utils.cache_manager')),
+    'export-feed': (cmd_export_feed, ('core.rozetka_api', 'parsers.supplier_loader', 'core.commissions',
+                                      'core.calculations', 'core.reports', 'core.yml_generator',
+                                      'utils.cache_manager')),
+    'diff': (cmd_diff, ('xml.etree.ElementTree', 'core.reports')),
+    'push': (cmd_push, ('xml.etree.ElementTree', 'core.rozetka_api', 'core.reports')),
+    'daemon': (cmd_daemon, ('core.rozetka_api', 'parsers.supplier_loader', 'core.commissions', 'core.calculations',
+                            'core.reports', 'core.yml_generator', 'utils.cache_manager')),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Розрахунок цін і фіду для Rozetka")
+    parser.add_argument('--log-level', default='INFO', help="Рівень логування (DEBUG, INFO, WARNING...)")
+    parser.add_argument('--import-time', action='store_true',
+                        help="Лише імпортувати модулі команди і показати час (без виконання)")
+    commands = parser.add_subparsers(dest='command', metavar='команда')
+    commands.add_parser('run', help="Повний прогін: fetch, parse-supplier, price, export-feed (за замовчуванням)")
+    commands.add_parser('fetch', help="Оновити кеш товарів Rozetka з API")
+    parse_supplier = commands.add_parser('parse-supplier', help="Завантажити й розпарсити фіди постачальників")
+    parse_supplier.add_argument('--config', default=SUPPLIERS_CONFIG, help="Конфіг постачальників")
+    commands.add_parser('price', help="Рекомендації цін з кешів (без мережі), лише звіти")
+    commands.add_parser('export-feed', help="Рекомендації з кешів, новий фід, дельта і звіт змін")
+    diff = commands.add_parser('diff', help="Порівняти два XML-фіди")
+    diff.add_argument('old', nargs='?', default=OLD_XML, help=f"Старий фід (за замовчуванням {OLD_XML})")
+    diff.add_argument('new', nargs='?', default=OUTPUT_XML, help=f"Новий фід (за замовчуванням {OUTPUT_XML})")
+    diff.add_argument('--limit', type=int, default=3, help="Скільки змін показати")
+    diff.add_argument('--report', help="Записати зміни у звіт (.xlsx/.csv/.parquet)")
+    push = commands.add_parser('push', help="Надіслати ціни/залишки offers з фіду напряму в Seller API")
+    push.add_argument('--file', default="output/rozetka_delta.xml",
+                      help="Фід з offers для push (за замовчуванням дельта-фід)")
+    daemon = commands.add_parser('daemon', help="Демон: стан у пам'яті, перерахунок за розкладом і при змінах")
+    daemon.add_argument('--poll', type=float, default=DAEMON_POLL_INTERVAL, help="Інтервал опитування, с")
+    daemon.add_argument('--reprice', type=float, default=DAEMON_REPRICE_INTERVAL,
+                        help="Плановий перерахунок не рідше ніж раз на стільки секунд")
+    daemon.add_argument('--catalog', type=float, default=DAEMON_CATALOG_INTERVAL,
+                        help="Оновлення каталогу Rozetka раз на стільки секунд")
+    daemon.add_argument('--max-polls', type=int, help="Зупинитися після N опитувань (для перевірки)")
+    return parser
+
+
+def _import_command(modules):
+    """Імпортує модулі команди, повертає кількість нових модулів у sys.modules."""
+    loaded = len(sys.modules)
+    for module in modules:
+        importlib.import_module(module)
+    return len(sys.modules) - loaded
+
+
+def cli(argv=None):
+    args = build_parser().parse_args(argv)
+    command = args.command or 'run'
+    setup_logging(getattr(logging, args.log_level.upper(), logging.INFO))
+    handler, modules = COMMANDS[command]
+
+    if args.import_time:
+        start = time.perf_counter()
+        count = _import_command(modules)
+        print(f"{command}: імпорт {(time.perf_counter() - start) * 1000:.0f} мс ({count} модулів)")
+        return 0
+
+    if command == 'push' or (PUSH_PRICES and command in ('run', 'export-feed', 'daemon')):
+        from core.rozetka_api import push_endpoint
+
+        try:
+            push_endpoint()  # Ненастроєний push — одразу, а не після генерації фіду
+        except RuntimeError as e:
+            logging.error(str(e))
+            return 1
 
+    with RunProfiler(profile_stages=PROFILE_STAGES, profiler=PROFILER, command=command) as profiler:
+        with stage('imports') as counters:
+            counters['modules'] = _import_command(modules)
+        handler(args)
+    profiler.print_summary()
+    return 0
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    sys.exit(cli())
@@ -0,0 +1,30 @@
+import json
+import logging
+import os
+
+FEED_STATE_FILE = "cache/feed_state.json"  # ETag/Last-Modified/MDTM/SIZE по кожному постачальнику
+
+# Результати завантаження фіду (обидва truthy, помилка — False)
+FEED_DOWNLOADED = 'downloaded'
+FEED_UNCHANGED = 'unchanged'
+
+
+def load_feed_state(path=FEED_STATE_FILE):
+    """{supplier_name: {...}} зі стану попередніх завантажень."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"Не вдалося прочитати стан фідів {path}: {e}")
+        return {}
+
+
+def save_feed_state(state, path=FEED_STATE_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
+
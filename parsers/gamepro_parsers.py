@@ -1,9 +1,12 @@
-import xml.etree.ElementTree as ET
-from ftplib import FTP
+from ftplib import FTP, error_perm
 import logging
 import os
 import yaml  # pip install pyyaml якщо немає
 
+from .feed_state import FEED_DOWNLOADED, FEED_UNCHANGED, load_feed_state, save_feed_state
+from .parse_cache import parse_with_cache
+from .xml_stream import parse_offers_file
+
 
 def load_supplier_config(config_path='config.yaml'):
     """Завантажує config для постачальника."""
@@ -12,77 +15,79 @@ def load_supplier_config(config_path='config.yaml'):
     return config['suppliers']['gamepro']  # Тільки GamePro
 
 
-def download_gamepro_xml(host, user, pass_, file_name):
-    """Завантажує XML з FTP GamePro."""
+def _ftp_remote_info(ftp, file_name):
+    """(MDTM, SIZE) файлу на FTP; None там, де сервер не підтримує команду."""
+    mdtm = size = None
+    try:
+        mdtm = ftp.sendcmd(f"MDTM {file_name}").split()[-1]
+    except error_perm:
+        pass
+    try:
+        ftp.voidcmd("TYPE I")
+        size = ftp.size(file_name)
+    except error_perm:
+        pass
+    return mdtm, size
+
+
+def download_gamepro_xml(host, user, pass_, file_name, state=None):
+    """Завантажує XML з FTP GamePro.
+
+    state — dict стану цього постачальника (оновлюється на місці): якщо MDTM і SIZE не змінились
+    і локальний файл на місці, RETR пропускається. Перерване завантаження докачується з .part (REST).
+    Повертає FEED_DOWNLOADED, FEED_UNCHANGED або False.
+    """
+    state = {} if state is None else state
+    part_file = f"{file_name}.part"
     try:
         ftp = FTP(host)
         ftp.login(user, pass_)
-        with open(file_name, "wb") as f:
-            ftp.retrbinary(f"RETR {file_name}", f.write)
+        mdtm, size = _ftp_remote_info(ftp, file_name)
+
+        if (mdtm and size is not None and state.get('mdtm') == mdtm and state.get('size') == size
+                and os.path.exists(file_name) and os.path.getsize(file_name) == size):
+            ftp.quit()
+            logging.info(f"XML GamePro не змінився (MDTM {mdtm}, {size} байт), завантаження пропущено")
+            return FEED_UNCHANGED
+
+        # Докачка, якщо .part від тієї ж версії файлу
+        offset = 0
+        if mdtm and state.get('partial_mdtm') == mdtm and os.path.exists(part_file):
+            offset = os.path.getsize(part_file)
+        state['partial_mdtm'] = mdtm
+        with open(part_file, "ab" if offset else "wb") as f:
+            ftp.retrbinary(f"RETR {file_name}", f.write, rest=offset or None)
         ftp.quit()
-        logging.info(f"XML завантажено з FTP GamePro: {file_name}")
-        return True
+
+        os.replace(part_file, file_name)
+        state.pop('partial_mdtm', None)
+        state.update({'mdtm': mdtm, 'size': size})
+        logging.info(f"XML завантажено з FTP GamePro: {file_name}" + (f" (докачка з {offset} байт)" if offset else ""))
+        return FEED_DOWNLOADED
     except Exception as e:
         logging.error(f"Помилка FTP GamePro: {e}")
         return False
 
 
 def parse_gamepro_xml(file_name):
-    """Парсинг XML GamePro."""
-    try:
-        tree = ET.parse(file_name)
-        root = tree.getroot()
-        supplier_offers = root.findall(".//offer")
-
-        supplier_dict = {}
-        for sup_offer in supplier_offers:
-            supplier_id = sup_offer.get("id")
-            if not supplier_id:
-                continue
-
-            available_attr = sup_offer.get("available", "false")
-            available = "true" if available_attr.lower() == "true" else "false"
-            stock_qty = "100" if available == "true" else "0"
-
-            purchase_text = sup_offer.findtext("price") or "0"
-            old_price_text = sup_offer.findtext("price_rrp") or None
-            rrp_price_text = sup_offer.findtext("price_promo_rrp") or None
-
-            # Обробка коми
-            purchase_price = float(purchase_text.replace(',', '.')) if purchase_text else 0.0
-            old_price = float(old_price_text.replace(',', '.')) if old_price_text else None
-
-            # Логіка для supplier_price: RRP якщо є, інакше old_price
-            is_rrp_fallback = False
-            if rrp_price_text and float(rrp_price_text.replace(',', '.')) > 0:
-                supplier_price = float(rrp_price_text.replace(',', '.'))
-            elif old_price_text:
-                supplier_price = old_price
-                is_rrp_fallback = True
-            else:
-                supplier_price = 0.0
-                is_rrp_fallback = True
-
-            supplier_dict[supplier_id] = {
-                'purchase_price': purchase_price,
-                'supplier_price': supplier_price,
-                'old_price': old_price,
-                'available': available,
-                'stock_quantity': int(stock_qty),
-                'is_rrp_fallback': is_rrp_fallback
-            }
-
-        logging.info(f"Парсинг XML GamePro: {len(supplier_dict)} товарів")
-        return supplier_dict
-    except Exception as e:
-        logging.error(f"Помилка парсингу XML GamePro: {e}")
-        return {}
+    """Парсинг XML GamePro (потоковий, див. parsers.xml_stream)."""
+    return parse_offers_file(file_name, label="XML GamePro")
 
 
 def parse_gamepro(config_path='config.yaml'):
     """Повний парсинг GamePro з config."""
     config = load_supplier_config(config_path)
     file_name = config['file']
-    if download_gamepro_xml(config['host'], config['user'], config['pass'], file_name):
-        return parse_gamepro_xml(file_name)
+    feed_state = load_feed_state()
+    status = download_gamepro_xml(config['host'], config['user'], config['pass'], file_name,
+                                  feed_state.setdefault('gamepro', {}))
+    if status:
+        # Той самий вміст фіду (за хешем) — результат з кешу парсингу, без повторного розбору XML
+        state = feed_state['gamepro']
+        known_digest = state.get('digest') if status == FEED_UNCHANGED else None
+        supplier_dict, state['digest'] = parse_with_cache(file_name, parse_gamepro_xml, supplier='gamepro',
+                                                          digest=known_digest)
+        save_feed_state(feed_state)
+        return supplier_dict
+    save_feed_state(feed_state)
     return {}
\ No newline at end of file
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+
+PARSE_CACHE_DIR = "cache/parsed"
+PARSE_CACHE_MAX_ENTRIES = 8  # Версій фідів (усіх постачальників разом), що зберігаються
+PARSE_CACHE_VERSION = 2  # Збільшити при зміні формату результату парсера — старі записи стануть промахами
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file_name, chunk_size=HASH_CHUNK_SIZE):
+    """Потоковий BLAKE2b-хеш вмісту файлу (hex), без читання файлу в пам'ять цілком."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Кеш результатів парсингу фідів за хешем вмісту файлу.
+
+    Кожна версія фіду — окремий pickle у cache_dir, index.json тримає для неї постачальника,
+    розмір і час останнього використання. Понад max_entries записів витісняються найдавніше
+    використані (LRU) — спільно для всіх постачальників. hits/misses/evictions — статистика прогону.
+    """
+
+    def __init__(self, cache_dir=PARSE_CACHE_DIR, max_entries=PARSE_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            return {digest: entry for digest, entry in index.items() if entry.get('version') == PARSE_CACHE_VERSION}
+        except Exception as e:
+            logging.warning(f"Не вдалося прочитати індекс кешу парсингу {self.index_file}: {e}")
+            return {}
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.pickle")
+
+    def get(self, digest):
+        """Збережений результат парсингу для хешу або None (промах)."""
+        entry = self.index.get(digest)
+        if entry is not None:
+            try:
+                with open(self._path(digest), 'rb') as f:
+                    data = pickle.load(f)
+                entry['last_used'] = time.time()
+                self.hits += 1
+                return data
+            except Exception as e:
+                logging.warning(f"Пошкоджений запис кешу парсингу {digest}: {e}")
+                self.index.pop(digest, None)
+        self.misses += 1
+        return None
+
+    def put(self, digest, data, supplier=None):
+        """Зберігає результат парсингу і витісняє найдавніше використані записи понад ліміт."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(digest)
+        with open(f"{path}.tmp", 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+        self.index[digest] = {'supplier': supplier, 'offers': len(data), 'bytes': os.path.getsize(path),
+                              'last_used': time.time(), 'version': PARSE_CACHE_VERSION}
+        self._evict()
+        self.save()
+
+    def _evict(self):
+        by_age = sorted(self.index, key=lambda digest: self.index[digest]['last_used'])
+        for digest in by_age[:max(0, len(self.index) - self.max_entries)]:
+            del self.index[digest]
+            self.evictions += 1
+        # Файли без запису в індексі (витіснені, старий формат) — прибираємо
+        keep = {f"{digest}.pickle" for digest in self.index} | {"index.json"}
+        for file_name in os.listdir(self.cache_dir):
+            if file_name not in keep:
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+    def save(self):
+        """Атомарно записує індекс (зокрема оновлений last_used після get)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(f"{self.index_file}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(f"{self.index_file}.tmp", self.index_file)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.index)}
+
+
+def parse_with_cache(file_name, parse, cache=None, supplier=None, digest=None):
+    """parse(file_name) через ParseCache: при збігу хешу вмісту — збережений результат без парсингу XML.
+
+    digest — уже відомий хеш файлу (щоб не рахувати повторно). Повертає (результат, digest).
+    """
+    cache = ParseCache() if cache is None else cache
+    digest = digest or file_digest(file_name)
+    data = cache.get(digest)
+    if data is not None:
+        cache.save()
+        logging.info(f"{supplier or file_name}: кеш парсингу за хешем {digest[:12]} ({len(data)} офферів)")
+        return data, digest
+    data = parse(file_name)
+    if data:
+        cache.put(digest, data, supplier)
+    return data, digest
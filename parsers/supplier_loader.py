@@ -1,7 +1,17 @@
-import aiohttp
+import asyncio
 import yaml
 import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from .feed_state import FEED_DOWNLOADED, FEED_UNCHANGED, load_feed_state, save_feed_state
+from .parse_cache import ParseCache, file_digest, parse_with_cache
+from .xml_stream import parse_offers_file
 from .gamepro_parsers import download_gamepro_xml, parse_gamepro_xml  # Для FTP
+from utils.logger_setup import stage
+
+HTTP_CHUNK_SIZE = 256 * 1024  # Розмір шматка при потоковому завантаженні
 
 
 async def load_supplier_config(config_path='config.yaml'):
@@ -11,97 +21,310 @@ async def load_supplier_config(config_path='config.yaml'):
     return config['suppliers']
 
 
-async def download_http_file(url, file_name):
-    """Скачує файл з URL (для method='http')."""
+async def download_http_file(url, file_name, state=None, chunk_size=HTTP_CHUNK_SIZE):
+    """Скачує файл з URL (для method='http') потоково, шматками на диск.
+
+    state — dict стану постачальника (оновлюється на місці): ETag/Last-Modified для умовного
+    запиту (304 — файл не змінився), докачка перерваного .part через Range/If-Range.
+    Повертає FEED_DOWNLOADED, FEED_UNCHANGED або False.
+    """
+    import aiohttp
+
+    state = {} if state is None else state
+    part_file = f"{file_name}.part"
+    headers = {}
+    if os.path.exists(file_name):
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+    offset = 0
+    validator = state.get('partial_etag') or state.get('partial_last_modified')
+    if validator and os.path.exists(part_file):
+        offset = os.path.getsize(part_file)
+        headers['Range'] = f"bytes={offset}-"
+        headers['If-Range'] = validator
+
     try:
         async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    with open(file_name, 'wb') as f:
-                        f.write(await resp.read())
-                    logging.info(f"Файл завантажено з {url}: {file_name}")
-                    return True
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 304:
+                    logging.info(f"Файл {url} не змінився (304), завантаження пропущено")
+                    return FEED_UNCHANGED
+                if resp.status not in (200, 206):
+                    logging.error(f"HTTP {resp.status} для {url}")
+                    return False
+
+                etag = resp.headers.get('ETag')
+                last_modified = resp.headers.get('Last-Modified')
+                resumed = resp.status == 206
+                state['partial_etag'] = etag
+                state['partial_last_modified'] = last_modified
+                with open(part_file, 'ab' if resumed else 'wb') as f:
+                    async for chunk in resp.content.iter_chunked(chunk_size):
+                        f.write(chunk)
+
+        os.replace(part_file, file_name)
+        state.pop('partial_etag', None)
+        state.pop('partial_last_modified', None)
+        state.update({'etag': etag, 'last_modified': last_modified})
+        logging.info(f"Файл завантажено з {url}: {file_name}" + (f" (докачка з {offset} байт)" if resumed else ""))
+        return FEED_DOWNLOADED
     except Exception as e:
         logging.error(f"Помилка HTTP скачування {url}: {e}")
     return False
 
 
+def _local_file_status(file_name, state):
+    """Для method='local': незмінений, якщо mtime і розмір ті самі, що минулого разу."""
+    stat = os.stat(file_name)
+    if state.get('mtime') == stat.st_mtime and state.get('size') == stat.st_size:
+        return FEED_UNCHANGED
+    state.update({'mtime': stat.st_mtime, 'size': stat.st_size})
+    return FEED_DOWNLOADED
+
+
 def parse_xml_file(file_name):
     """Загальний парсер XML (як у GamePro, для будь-якого)."""
-    # Тут копіюємо логіку з parse_gamepro_xml — для уніфікації
-    import xml.etree.ElementTree as ET
-    try:
-        tree = ET.parse(file_name)
-        root = tree.getroot()
-        supplier_offers = root.findall(".//offer")
-
-        supplier_dict = {}
-        for sup_offer in supplier_offers:
-            supplier_id = sup_offer.get("id")
-            if not supplier_id:
-                continue
-
-            available_attr = sup_offer.get("available", "false")
-            available = "true" if available_attr.lower() == "true" else "false"
-            stock_qty = "100" if available == "true" else "0"
-
-            purchase_text = sup_offer.findtext("price") or "0"
-            old_price_text = sup_offer.findtext("price_rrp") or None
-            rrp_price_text = sup_offer.findtext("price_promo_rrp") or None
-
-            purchase_price = float(purchase_text.replace(',', '.')) if purchase_text else 0.0
-            old_price = float(old_price_text.replace(',', '.')) if old_price_text else None
-
-            is_rrp_fallback = False
-            if rrp_price_text and float(rrp_price_text.replace(',', '.')) > 0:
-                supplier_price = float(rrp_price_text.replace(',', '.'))
-            elif old_price_text:
-                supplier_price = old_price
-                is_rrp_fallback = True
-            else:
-                supplier_price = 0.0
-                is_rrp_fallback = True
-
-            supplier_dict[supplier_id] = {
-                'purchase_price': purchase_price,
-                'supplier_price': supplier_price,
-                'old_price': old_price,
-                'available': available,
-                'stock_quantity': int(stock_qty),
-                'is_rrp_fallback': is_rrp_fallback
-            }
-
-        logging.info(f"Парсинг XML: {len(supplier_dict)} товарів")
-        return supplier_dict
-    except Exception as e:
-        logging.error(f"Помилка парсингу XML: {e}")
-        return {}
+    return parse_offers_file(file_name)
 
 
-async def parse_supplier(supplier_name, config):
-    """Загальний парсер для постачальника з config."""
+def parse_xml_file_cached(file_name, supplier_name=None, cache=None):
+    """parse_xml_file з кешем за хешем вмісту (parsers.parse_cache)."""
+    return parse_with_cache(file_name, parse_xml_file, cache, supplier_name)[0]
+
+
+async def download_supplier(supplier_name, config, state=None):
+    """Завантажує фід постачальника, повертає (шлях до файлу, FEED_DOWNLOADED | FEED_UNCHANGED) або (None, False).
+
+    FTP (блокуючий ftplib) виконується в пулі потоків, щоб не зупиняти інші завантаження.
+    state — dict стану цього постачальника для умовних/докачуваних завантажень.
+    """
+    state = {} if state is None else state
     method = config['method']
     file_name = config.get('file', f"{supplier_name}_prices.xml")
 
+    status = False
     if method == 'ftp':
         # GamePro
         host = config['host']
         user = config['user']
         pass_ = config['pass']
-        if download_gamepro_xml(host, user, pass_, file_name):
-            return parse_xml_file(file_name)
+        status = await asyncio.to_thread(download_gamepro_xml, host, user, pass_, file_name, state)
     elif method == 'http':
         # З сайту
         url = config['url']
-        if await download_http_file(url, file_name):
-            return parse_xml_file(file_name)
+        status = await download_http_file(url, file_name, state)
     elif method == 'local':
         # Локальний файл
         if os.path.exists(file_name):
-            return parse_xml_file(file_name)
+            status = _local_file_status(file_name, state)
     else:
         logging.error(f"Невідомий method '{method}' для {supplier_name}")
+    return (file_name, status) if status else (None, False)
 
+
+async def parse_supplier(supplier_name, config):
+    """Загальний парсер для постачальника з config."""
+    file_name, _ = await download_supplier(supplier_name, config)
+    if file_name:
+        return parse_xml_file_cached(file_name, supplier_name)
     return {}
 
-# Для зручності — async, бо HTTP aiohttp
\ No newline at end of file
+
+def merge_supplier_offers(per_supplier, policy='cheapest', priority=None):
+    """Зводить офери кількох постачальників в одну таблицю {offer_id: запис}.
+
+    policy='cheapest' — при конфлікті offer_id перемагає менша purchase_price;
+    policy='priority' — перемагає постачальник, що раніше в priority (за замовчуванням — порядок у config).
+    У копії кожного запису заповнюється supplier — ім'я постачальника-переможця.
+    """
+    if policy not in ('cheapest', 'priority'):
+        raise ValueError(f"Невідома політика злиття постачальників: {policy}")
+    order = list(priority or per_supplier)
+    rank = {name: i for i, name in enumerate(order)}
+
+    merged = {}
+    conflicts = 0
+    for supplier_name in sorted(per_supplier, key=lambda name: rank.get(name, len(order))):
+        for offer_id, record in per_supplier[supplier_name].items():
+            current = merged.get(offer_id)
+            if current is not None:
+                conflicts += 1
+                if policy == 'priority' or current.purchase_price <= record.purchase_price:
+                    continue
+            merged[offer_id] = replace(record, supplier=supplier_name)
+
+    logging.info(f"Зведено {len(per_supplier)} постачальників: {len(merged)} офферів, конфліктів {conflicts} ({policy})")
+    return merged
+
+
+class ResidentOffers:
+    """Розпарсені фіди й зведена таблиця в пам'яті між викликами load_all_suppliers (режим демона).
+
+    Фід з тим самим хешем береться звідси без читання кешу парсингу; якщо жоден фід і налаштування
+    злиття не змінилися, повертається та сама зведена таблиця. changed — постачальники, чий фід
+    змінився (з'явився, зник) в останньому виклику.
+    """
+
+    def __init__(self):
+        self.feeds = {}  # {постачальник: (хеш, офери)}
+        self.merged = None
+        self.merge_key = None
+        self.changed = []
+
+
+def load_cached_suppliers(config_path='config.yaml'):
+    """Офери з кешу парсингу без завантаження фідів: запис за хешем останньої версії фіду з feed_state.
+
+    Злиття — як у load_all_suppliers. Повертає (злиті офери, постачальники без кешованого фіду).
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    merge_config = config.get('merge') or {}
+    names = list(config['suppliers'])
+    feed_state = load_feed_state()
+
+    parse_cache = ParseCache()
+    per_supplier = {}
+    missing = []
+    for name in names:
+        state = feed_state.get(name, {})
+        digest = state.get('good_digest') or state.get('digest')
+        cached = parse_cache.get(digest) if digest else None
+        if cached is None:
+            missing.append(name)
+            logging.warning(f"{name}: немає кешованого фіду — потрібен parse-supplier")
+        else:
+            per_supplier[name] = cached
+    parse_cache.save()
+
+    merged = merge_supplier_offers(per_supplier, policy=merge_config.get('policy', 'cheapest'),
+                                   priority=merge_config.get('priority'))
+    return merged, missing
+
+
+def _last_good_offers(name, state, parse_cache, resident):
+    """(хеш, офери) останнього вдалого парсингу постачальника: з пам'яті демона або кешу парсингу; (None, None)."""
+    if resident is not None and resident.feeds.get(name, (None, None))[1]:
+        return resident.feeds[name]
+    digest = state.get('good_digest') or state.get('digest')  # Старий feed_state — без good_digest
+    cached = parse_cache.get(digest) if digest else None
+    return (digest, cached) if cached else (None, None)
+
+
+async def load_all_suppliers(config_path='config.yaml', stats=None, resident=None):
+    """Усі постачальники з config: паралельне завантаження, парсинг у пулі процесів, злиття.
+
+    Політика злиття — config['merge']['policy'] ('cheapest' | 'priority'), порядок пріоритету —
+    config['merge']['priority'] або порядок постачальників у config. Фіди з тим самим вмістом
+    (за хешем) не парсяться повторно — див. parsers.parse_cache; якщо передано stats (dict),
+    у stats['parse_cache'] записуються hits/misses/evictions кешу, у stats['fallback'] — постачальники
+    з останнім вдалим фідом. resident (ResidentOffers) тримає результат між викликами в одному процесі.
+
+    Якщо фід не завантажився або розпарсився порожнім, береться останній вдалий парсинг цього
+    постачальника (resident або кеш парсингу за good_digest), інакше його офери зникли б з фіду і
+    снапшоту як зняті з продажу. Без вдалого парсингу постачальник пропускається — з нього ще нічого
+    не публікувалося.
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    suppliers = config['suppliers']
+    merge_config = config.get('merge') or {}
+
+    start = time.perf_counter()
+    names = list(suppliers)
+    feed_state = load_feed_state()
+    with stage('download') as counters:
+        downloads = await asyncio.gather(*(download_supplier(name, suppliers[name], feed_state.setdefault(name, {}))
+                                           for name in names))
+        counters.update(feeds=len(names), downloaded=sum(1 for _, status in downloads if status == FEED_DOWNLOADED),
+                        unchanged=sum(1 for _, status in downloads if status == FEED_UNCHANGED))
+    logging.info(f"Завантажено фідів: {sum(1 for _, status in downloads if status)}/{len(names)} "
+                 f"за {time.perf_counter() - start:.2f} с")
+
+    # Хеш вмісту: для незміненого фіду — збережений у стані, інакше рахуємо (у потоках, паралельно)
+    fetched = {name: file_name for name, (file_name, status) in zip(names, downloads) if status}
+    digests = {name: feed_state[name].get('digest') for name, (_, status) in zip(names, downloads)
+               if status == FEED_UNCHANGED}
+    to_hash = [name for name in fetched if not digests.get(name)]
+    for name, digest in zip(to_hash, await asyncio.gather(*(asyncio.to_thread(file_digest, fetched[name])
+                                                             for name in to_hash))):
+        digests[name] = digest
+        feed_state[name]['digest'] = digest
+    save_feed_state(feed_state)
+
+    merge_key = (merge_config.get('policy', 'cheapest'), tuple(merge_config.get('priority') or names))
+    if resident is not None:
+        # Постачальник з невдалим завантаженням лишається з фідом у пам'яті — не зміна
+        resident.changed = sorted(name for name in set(fetched) | set(resident.feeds)
+                                  if name not in suppliers
+                                  or (name in fetched and resident.feeds.get(name, (None,))[0] != digests[name]))
+        if not resident.changed and resident.merge_key == merge_key and resident.merged is not None:
+            logging.info(f"Фіди не змінилися — зведені офери з пам'яті ({len(resident.merged)})")
+            return resident.merged
+
+    # Збіг хешу — результат з пам'яті або кешу парсингу, решту парсимо
+    parse_cache = ParseCache()
+    per_supplier = {}
+    to_parse = {}
+    for name, file_name in fetched.items():
+        if resident is not None and resident.feeds.get(name, (None,))[0] == digests[name]:
+            per_supplier[name] = resident.feeds[name][1]
+            continue
+        cached = parse_cache.get(digests[name])
+        if cached is not None:
+            per_supplier[name] = cached
+            logging.info(f"{name}: кеш парсингу за хешем {digests[name][:12]} ({len(cached)} офферів)")
+        else:
+            to_parse[name] = file_name
+
+    with stage('parse') as counters:
+        if len(to_parse) > 1:
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(max_workers=len(to_parse)) as pool:
+                results = await asyncio.gather(*(loop.run_in_executor(pool, parse_xml_file, file_name)
+                                                 for file_name in to_parse.values()))
+        else:  # Один фід — пул процесів тільки додасть час на старт
+            results = [parse_xml_file(file_name) for file_name in to_parse.values()]
+        counters.update(parsed=len(to_parse), offers=sum(len(result) for result in results))
+    for name, supplier_dict in zip(to_parse, results):
+        per_supplier[name] = supplier_dict
+        if supplier_dict:
+            parse_cache.put(digests[name], supplier_dict, supplier=name)
+
+    feed_digests = dict(digests)
+    fallback = []
+    for name in names:
+        if per_supplier.get(name):
+            feed_state[name]['good_digest'] = digests[name]
+            continue
+        digest, offers = _last_good_offers(name, feed_state[name], parse_cache, resident)
+        if offers:
+            per_supplier[name] = offers
+            feed_digests[name] = digest
+            fallback.append(name)
+            logging.warning(f"{name}: фід не отримано або порожній — останній вдалий фід ({len(offers)} офферів)")
+        else:
+            per_supplier.pop(name, None)
+            logging.error(f"{name}: фід не отримано і вдалого фіду ще не було — постачальник пропущений")
+    save_feed_state(feed_state)
+    parse_cache.save()
+
+    cache_stats = parse_cache.stats()
+    logging.info(f"Кеш парсингу: {cache_stats['hits']} влучань, {cache_stats['misses']} промахів, "
+                 f"витіснено {cache_stats['evictions']}")
+    if stats is not None:
+        stats['parse_cache'] = cache_stats
+        stats['fallback'] = fallback
+
+    merged = merge_supplier_offers({name: per_supplier[name] for name in names if name in per_supplier},
+                                   policy=merge_config.get('policy', 'cheapest'),
+                                   priority=merge_config.get('priority'))
+    if resident is not None:
+        resident.feeds = {name: (feed_digests[name], per_supplier[name]) for name in per_supplier}
+        resident.merged = merged
+        resident.merge_key = merge_key
+    logging.info(f"Інжест постачальників: {time.perf_counter() - start:.2f} с")
+    return merged
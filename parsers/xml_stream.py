@@ -0,0 +1,75 @@
+import xml.etree.ElementTree as ET
+import logging
+import time
+
+from core.records import SupplierOffer
+
+
+def _to_float(text):
+    """Ціна з фіду: кома як десятковий роздільник."""
+    return float(text.replace(',', '.'))
+
+
+def offer_record(sup_offer):
+    """SupplierOffer з елемента <offer> (спільні правила для всіх постачальників)."""
+    available_attr = sup_offer.get("available", "false")
+    available = "true" if available_attr.lower() == "true" else "false"
+    stock_qty = 100 if available == "true" else 0
+
+    purchase_text = sup_offer.findtext("price") or "0"
+    old_price_text = sup_offer.findtext("price_rrp") or None
+    rrp_price_text = sup_offer.findtext("price_promo_rrp") or None
+
+    purchase_price = _to_float(purchase_text) if purchase_text else 0.0
+    old_price = _to_float(old_price_text) if old_price_text else None
+
+    # Логіка для supplier_price: RRP якщо є, інакше old_price
+    is_rrp_fallback = False
+    rrp_price = _to_float(rrp_price_text) if rrp_price_text else 0.0
+    if rrp_price > 0:
+        supplier_price = rrp_price
+    elif old_price_text:
+        supplier_price = old_price
+        is_rrp_fallback = True
+    else:
+        supplier_price = 0.0
+        is_rrp_fallback = True
+
+    return SupplierOffer(purchase_price, supplier_price, old_price, available, stock_qty, is_rrp_fallback)
+
+
+def iter_offers(file_name):
+    """Потоковий парсинг фіду через iterparse: yield (offer_id, запис) для кожного <offer>.
+
+    Кожен оброблений <offer> одразу очищується і від'єднується від батька,
+    тож пам'ять не росте з розміром фіду.
+    """
+    parents = []
+    for event, elem in ET.iterparse(file_name, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag != "offer":
+            continue
+
+        supplier_id = elem.get("id")
+        if supplier_id:
+            yield supplier_id, offer_record(elem)
+        elem.clear()
+        if parents:
+            parents[-1].remove(elem)
+
+
+def parse_offers_file(file_name, label="XML"):
+    """Будує dict {offer_id: запис} з потокового парсера і логує пропускну здатність."""
+    try:
+        start = time.perf_counter()
+        supplier_dict = dict(iter_offers(file_name))
+        elapsed = time.perf_counter() - start
+        rate = len(supplier_dict) / elapsed if elapsed > 0 else 0
+        logging.info(f"Парсинг {label}: {len(supplier_dict)} товарів за {elapsed:.2f} с ({rate:.0f} offers/sec)")
+        return supplier_dict
+    except Exception as e:
+        logging.error(f"Помилка парсингу {label}: {e}")
+        return {}
@@ -0,0 +1,41 @@
+# SQLite-кеш товарів Rozetka (utils/cache_manager.ItemsCache): ключі str/int і типи полів.
+import json
+
+from core.records import RozetkaItem
+from utils.cache_manager import ItemsCache
+
+
+def item(i, category_id):
+    return RozetkaItem(name=f"Товар {i}", price=100 + i, price_old=150.5, commission_percent=12.5,
+                       commission_sum=i * 1.5, brand='Sony', category_id=category_id, available=bool(i % 2),
+                       stock_quantity=i, price_offer_id=f"U{i:04d}", hierarchy=[['Ігри', 1], ['Консолі', category_id]])
+
+
+def test_items_round_trip_with_str_and_int_ids(tmp_path):
+    items = {500000001: item(1, 80001), '500000002': item(2, '80002'), 500000003: item(3, None)}
+    items[500000003].hierarchy = []
+    with ItemsCache(str(tmp_path / 'items.sqlite')) as store:
+        store.replace_items(items, '2026-01-01T00:00:00')
+        loaded = store.load_items()
+        assert loaded == {str(rz_id): value for rz_id, value in items.items()}
+        assert type(loaded['500000001'].category_id) is int and loaded['500000002'].category_id == '80002'
+        assert store.get_item(500000001) == store.get_item('500000001') == items[500000001]
+        assert store.get_item(500000002) == items['500000002']
+
+        store.update_items({'500000001': item(11, 80001)}, [500000002], '2026-01-02T00:00:00')
+        assert sorted(store.load_items()) == ['500000001', '500000003']
+        assert store.get_item(500000001).price == 111 and store.get_item('500000002') is None
+        assert store.load_meta() == {'timestamp': '2026-01-02T00:00:00', 'total_count': 2}
+
+
+def test_migration_from_json_cache(tmp_path):
+    json_path = tmp_path / 'rozetka_cache.json'
+    old_item = {'name': 'Товар', 'price': 100, 'category_id': 80001, 'price_offer_id': 'U0001',
+                'hierarchy': [['Ігри', 1]], 'unknown_field': 1}
+    json_path.write_text(json.dumps({'timestamp': '2026-01-01T00:00:00', 'items': {'500000001': old_item}}),
+                         encoding='utf-8')
+    with ItemsCache(str(tmp_path / 'items.sqlite')) as store:
+        assert store.migrate_from_json(str(json_path))
+        assert not store.migrate_from_json(str(json_path))  # Уже мігровано
+        assert store.get_item(500000001) == RozetkaItem(name='Товар', price=100, category_id=80001,
+                                                        price_offer_id='U0001', hierarchy=[['Ігри', 1]])
@@ -0,0 +1,29 @@
+# Співставлення Rozetka і постачальника (match_and_compare).
+from dataclasses import replace
+
+from benchmarks.bench_matching import make_catalogs
+from core.calculations import get_differences_summary, match_and_compare
+
+
+def without_differences(matches):
+    return [replace(match, differences=None) for match in matches]
+
+
+def test_with_differences_changes_only_difference_strings():
+    rozetka_items, supplier_dict = make_catalogs(2000)
+    full = match_and_compare(rozetka_items, supplier_dict, with_differences=True)
+    light = match_and_compare(rozetka_items, supplier_dict, with_differences=False)
+
+    matches, rozetka_only, supplier_only, differences, price_differences, *counts = full
+    assert len(matches) == 1600 and len(rozetka_only) == 400 and len(supplier_only) == 400
+    assert without_differences(matches) == light[0]
+    assert (rozetka_only, supplier_only, counts) == (light[1], light[2], list(light[5:]))
+    assert without_differences(differences) == light[3]
+    assert without_differences(price_differences) == light[4]
+
+    assert all(match.differences for match in differences)
+    assert all(match.differences is None for match in light[3])
+    match = price_differences[0]
+    assert match.differences[0] == (f"price: {match.rozetka.price} vs {match.supplier.supplier_price} "
+                                    f"(delta {match.price_delta:+.0f})")
+    assert get_differences_summary(light[3]) == {}
@@ -0,0 +1,80 @@
+# Еквівалентність CommissionIndex і старого пошуку по DataFrame на повній commissions.xlsx.
+# Запуск: python -m pytest tests (повільно: еталонний пошук — ~4 мс на виклик)
+import logging
+import os
+
+import pytest
+
+from core.commissions import CommissionIndex, get_commission, load_commissions, parse_range
+
+COMMISSIONS_XLSX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'commissions.xlsx')
+UNKNOWN_ID = 999999999
+
+
+@pytest.fixture(scope='module')
+def commissions():
+    if not os.path.exists(COMMISSIONS_XLSX):
+        pytest.skip(f"Немає {COMMISSIONS_XLSX}")
+    logging.disable(logging.WARNING)  # 'Комісія не знайдена' на кожен промах
+    try:
+        index = load_commissions(COMMISSIONS_XLSX, cache_file=None)
+        assert isinstance(index, CommissionIndex) and not index.empty
+        yield index.df, index
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _categories(df):
+    """{ID категорії: граничні ціни її діапазонів} — min-1, min, max, max+1 і дробові ціни поруч із межами."""
+    categories = {}
+    for cat_id, range_str in df[['ID категорії', 'Діапазон цін']].dropna().itertuples(index=False):
+        prices = categories.setdefault(cat_id, {0})
+        min_val, max_val = parse_range(range_str)
+        if min_val is not None:
+            prices.update({min_val - 1, min_val, min_val + 0.5, max_val - 0.5, max_val, max_val + 1})
+    return categories
+
+
+def _mismatches(df, index, cases):
+    mismatches = []
+    for hierarchy, brand, price in cases:
+        expected = get_commission(df, hierarchy, brand, price)
+        actual = get_commission(index, hierarchy, brand, price)
+        if expected != actual:
+            mismatches.append((hierarchy, brand, price, expected, actual))
+    return mismatches
+
+
+def test_every_category_range_edges(commissions):
+    df, index = commissions
+    cases = [([('leaf', int(cat_id))], '-', price)
+             for cat_id, prices in _categories(df).items() for price in sorted(prices)]
+    assert len(cases) > 1000
+    assert _mismatches(df, index, cases) == []
+
+
+def test_level_id_types_and_brands(commissions):
+    df, index = commissions
+    brands = [brand for brand in df['Бренд'].unique() if brand != '-']
+    cases = []
+    for i, (cat_id, prices) in enumerate(_categories(df).items()):
+        brand = brands[i % len(brands)]
+        price = sorted(prices)[len(prices) // 2]
+        for level_id in (int(cat_id), float(cat_id), str(int(cat_id))):
+            cases.append(([('leaf', level_id)], '-', price))
+        for case_brand in (brand, brand.upper(), None, ''):
+            cases.append(([('leaf', int(cat_id))], case_brand, price))
+    assert _mismatches(df, index, cases) == []
+
+
+def test_hierarchy_fallback(commissions):
+    df, index = commissions
+    cat_ids = [int(cat_id) for cat_id in _categories(df)]
+    cases = []
+    for parent_id, leaf_id in zip(cat_ids, cat_ids[1:]):
+        for price in (0, 5000, 20000.5):
+            cases.append(([('root', parent_id), ('leaf', UNKNOWN_ID)], '-', price))  # Leaf без комісії -> батько
+            cases.append(([('root', parent_id), ('leaf', leaf_id)], '-', price))  # Leaf має пріоритет
+    cases.append(([('leaf', UNKNOWN_ID)], '-', 1000))  # Дефолт 10%
+    cases.append(([], '-', 1000))
+    assert _mismatches(df, index, cases) == []
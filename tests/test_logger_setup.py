@@ -0,0 +1,22 @@
+# Етапи RunProfiler: вкладені назви і профілювання за повною назвою етапу.
+import os
+
+from utils.logger_setup import RunProfiler, stage
+
+
+def test_profile_stages_match_full_stage_name(tmp_path):
+    profile_dir = tmp_path / 'profiles'
+    with RunProfiler(profile_stages=['catalog/hierarchy'], report_dir=None, profile_dir=str(profile_dir)) as profiler:
+        with stage('catalog'):
+            with stage('hierarchy'):
+                pass
+        with stage('suppliers'):
+            with stage('hierarchy'):  # Та сама коротка назва під іншим етапом — без профілю
+                pass
+
+    records = {record['name']: record for record in profiler.stages}
+    assert list(records) == ['catalog', 'catalog/hierarchy', 'suppliers', 'suppliers/hierarchy']
+    assert records['catalog/hierarchy']['profile'].endswith('catalog-hierarchy.prof')
+    assert 'profile' not in records['suppliers/hierarchy']
+    assert os.listdir(profile_dir) == [os.path.basename(records['catalog/hierarchy']['profile'])]
+
@@ -0,0 +1,264 @@
+# Кеш товарів Rozetka і RozetkaClient проти локального стабу Seller API (benchmarks/rozetka_stub.py).
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import core.rozetka_api as api
+from benchmarks.rozetka_stub import PRICE_UPDATE_PATH, RozetkaStub
+from benchmarks.synthetic import make_categories, make_rozetka_items
+from utils.cache_manager import ItemsCache
+
+
+class FlakyStub(RozetkaStub):
+    """Стаб, у якого сторінки з broken_pages завжди відповідають 503."""
+
+    broken_pages = ()
+
+    async def _on_sale(self, request):
+        if int(request.query.get('page', 1)) in self.broken_pages:
+            self.requests['on_sale'] += 1
+            return web.Response(status=503)
+        return await super()._on_sale(request)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # cache/ — відносні шляхи
+    monkeypatch.setattr(api, 'ROZETKA_BACKOFF', 0.001)
+    return tmp_path
+
+
+def run_with_stub(stub, scenario):
+    """Запускає стаб і scenario(stub) в одному event loop."""
+    async def runner():
+        api.ROZETKA_BASE_URL = await stub.start()
+        try:
+            return await scenario(stub)
+        finally:
+            await stub.stop()
+
+    base_url = api.ROZETKA_BASE_URL
+    try:
+        return asyncio.run(runner())
+    finally:
+        api.ROZETKA_BASE_URL = base_url
+
+
+def make_stub(n=1000, stub_class=RozetkaStub):
+    categories, leaf_ids = make_categories(n_leaf=20)
+    return stub_class(make_rozetka_items(n, leaf_ids), categories)
+
+
+def cache_meta():
+    with ItemsCache(api.CACHE_DB) as store:
+        return store.load_meta(), store.load_items()
+
+
+def test_refresh_without_changes_renews_timestamp(workdir):
+    async def scenario(stub):
+        await api.build_items_cache('token')
+        with ItemsCache(api.CACHE_DB) as store:
+            store.touch('2020-01-01T00:00:00')  # Кеш застарів
+        stats = {}
+        await api.build_items_cache('token', stats=stats)
+        assert stats['items_cache'] == 'incremental'
+        stats = {}
+        await api.build_items_cache('token', stats=stats)
+        return stats
+
+    stats = run_with_stub(make_stub(), scenario)
+    assert stats['items_cache'] == 'valid'
+    meta, _ = cache_meta()
+    assert meta['timestamp'] > '2020-01-01T00:00:00'
+
+
+def test_cache_keys_are_strings_on_every_path(workdir):
+    async def scenario(stub):
+        full = await api.build_items_cache('token')
+        stub.items = stub.items[:900]
+        incremental = await api.build_items_cache('token', ttl_hours=0)
+        return full, incremental
+
+    full, incremental = run_with_stub(make_stub(), scenario)
+    assert len(full) == 1000 and len(incremental) == 900
+    assert all(isinstance(key, str) for key in list(full) + list(incremental))
+    assert set(incremental) <= set(full)
+
+
+def test_incomplete_listing_keeps_cached_items(workdir):
+    async def scenario(stub):
+        await api.build_items_cache('token')
+        stub.broken_pages = (3,)
+        return await api.build_items_cache('token', ttl_hours=0)
+
+    items = run_with_stub(make_stub(stub_class=FlakyStub), scenario)
+    _, cached = cache_meta()
+    assert len(items) == 1000
+    assert len(cached) == 1000
+
+
+class RetryOnceStub(RozetkaStub):
+    """Стаб, що відповідає 503 на першу спробу кожного пакета оновлень (за Idempotency-Key)."""
+
+    async def _mass_update(self, request):
+        key = request.headers.get('Idempotency-Key')
+        if key not in self.idempotency_keys:
+            self.requests['mass_update'] += 1
+            self.idempotency_keys.append(key)
+            return web.Response(status=503)
+        return await super()._mass_update(request)
+
+
+def make_offers(ids):
+    return [{'offer_id': offer_id, 'price': 100.0 + i, 'oldprice': 150.0, 'available': 'true' if i % 3 else 'false',
+             'stock_quantity': i % 5, 'name': f"Товар {i}"} for i, offer_id in enumerate(ids)]
+
+
+def push(stub, offers, **kwargs):
+    async def scenario(stub):
+        return await api.push_prices('token', offers, base_url=stub.base_url, path=PRICE_UPDATE_PATH,
+                                     rate_limit=1000, burst=1000, **kwargs)
+
+    return run_with_stub(stub, scenario)
+
+
+def test_push_requires_configured_endpoint(monkeypatch):
+    monkeypatch.setattr(api, 'ROZETKA_PRICE_UPDATE_PATH', None)
+    with pytest.raises(RuntimeError, match='ROZETKA_PRICE_UPDATE_PATH'):
+        asyncio.run(api.push_prices('token', make_offers(['A1'])))
+
+
+def test_push_batches_and_reports_per_offer_failures(workdir):
+    known = [f"U{i:04d}" for i in range(245)]
+    stub = RozetkaStub([{'price_offer_id': offer_id} for offer_id in known], {})
+    offers = make_offers(known + [f"X{i}" for i in range(5)])
+    stats = {}
+    results = push(stub, offers, batch_size=100, stats=stats)
+
+    assert stats == {'batches': 3, 'ok': 245, 'failed': 5, 'http_requests': 3}
+    assert stub.requests['mass_update'] == 3
+    assert all(results[offer_id] is None for offer_id in known)
+    assert all(results[f"X{i}"] == 'Товар не знайдено' for i in range(5))
+    assert stub.updates['U0004'] == api.price_update(offers[4])
+    assert stub.updates['U0004'] == {'price_offer_id': 'U0004', 'price': 104.0, 'price_old': 150.0,
+                                     'stock_quantity': 4, 'available': True}
+
+
+def test_push_retries_reuse_idempotency_key(workdir):
+    known = [f"U{i:04d}" for i in range(120)]
+    stub = RetryOnceStub([{'price_offer_id': offer_id} for offer_id in known], {})
+    stats = {}
+    results = push(stub, make_offers(known), batch_size=50, stats=stats)
+
+    assert stats['batches'] == 3 and stats['ok'] == 120 and stats['http_requests'] == 6
+    keys = stub.idempotency_keys
+    assert len(keys) == 6 and len(set(keys)) == 3
+    assert all(keys.count(key) == 2 for key in keys)  # Повтор — той самий ключ
+    assert all(error is None for error in results.values())
+
+
+def test_push_gives_up_after_retries(workdir):
+    stub = RozetkaStub([{'price_offer_id': 'U1'}], {}, fail_rate=1.0)
+    results = push(stub, make_offers(['U1', 'U2']), batch_size=1)
+    assert results['U1'].startswith('HTTP ') and results['U2'].startswith('HTTP ')
+    assert stub.requests['mass_update'] == 2 * (api.ROZETKA_MAX_RETRIES + 1)
+
+
+class RetryAfterStub(RozetkaStub):
+    """Стаб, що на перший запит сторінки відповідає 429 з Retry-After: 1."""
+
+    throttled = False
+
+    async def _on_sale(self, request):
+        if not self.throttled:
+            self.throttled = True
+            self.requests['on_sale'] += 1
+            return web.Response(status=429, headers={'Retry-After': '1'})
+        return await super()._on_sale(request)
+
+
+class ReversedDelayStub(RozetkaStub):
+    """Перші сторінки відповідають найпізніше — відповіді приходять у зворотному порядку."""
+
+    async def _on_sale(self, request):
+        page = int(request.query.get('page', 1))
+        await asyncio.sleep(max(0.0, 0.05 - page * 0.005))
+        return await super()._on_sale(request)
+
+
+class EmptyPageStub(RozetkaStub):
+    empty_page = 3
+
+    async def _on_sale(self, request):
+        if int(request.query.get('page', 1)) == self.empty_page:
+            return web.json_response({'content': {'items': [], '_meta': {'totalCount': len(self.items)}}})
+        return await super()._on_sale(request)
+
+
+def listing(stub, **client_kwargs):
+    """(товари, listing_complete, кількість запитів) з RozetkaClient.get_all_items проти стабу."""
+    async def scenario(stub):
+        async with api.RozetkaClient('token', stub.base_url, **client_kwargs) as client:
+            items = await client.get_all_items(page_size=100)
+            return items, client.listing_complete, client.request_count
+
+    return run_with_stub(stub, scenario)
+
+
+def test_pages_are_joined_in_page_order():
+    stub = make_stub(1000, ReversedDelayStub)
+    items, complete, requests = listing(stub)
+    assert [item['rz_item_id'] for item in items] == [item['rz_item_id'] for item in stub.items]
+    assert complete and requests == 11  # totalCount + 10 сторінок
+
+
+def test_failed_page_stops_listing_and_marks_it_incomplete():
+    stub = make_stub(1000, FlakyStub)
+    stub.broken_pages = (3,)
+    items, complete, _ = listing(stub, backoff=0.001)
+    assert [item['rz_item_id'] for item in items] == [item['rz_item_id'] for item in stub.items[:200]]
+    assert not complete
+    assert stub.requests['on_sale'] == 1 + 10 + api.ROZETKA_MAX_RETRIES  # Лише бита сторінка повторюється
+
+
+def test_empty_page_stops_listing_and_marks_it_incomplete():
+    items, complete, _ = listing(make_stub(1000, EmptyPageStub))
+    assert len(items) == 200 and not complete
+
+
+def test_failed_total_count_gives_empty_incomplete_listing():
+    stub = make_stub(100, FlakyStub)
+    stub.broken_pages = (1,)  # totalCount — теж запит page=1
+    items, complete, requests = listing(stub, max_retries=1, backoff=0.001)
+    assert items == [] and not complete and requests == 2
+
+
+def test_retry_after_is_honoured_before_backoff():
+    stub = make_stub(100, RetryAfterStub)
+
+    async def scenario(stub):
+        async with api.RozetkaClient('token', stub.base_url, backoff=0.001) as client:
+            started = asyncio.get_running_loop().time()
+            total = await client.get_total_count()
+            return total, asyncio.get_running_loop().time() - started, client.request_count
+
+    total, elapsed, requests = run_with_stub(stub, scenario)
+    assert total == 100 and requests == 2
+    assert elapsed >= 1.0  # Retry-After: 1, а не backoff 0.001 с
+
+
+def test_backoff_grows_exponentially():
+    stub = make_stub(100, FlakyStub)
+    stub.broken_pages = (1,)
+
+    async def scenario(stub):
+        async with api.RozetkaClient('token', stub.base_url, max_retries=3, backoff=0.05) as client:
+            started = asyncio.get_running_loop().time()
+            status, data = await client.get_json('/goods/on-sale', {'page': 1, 'pageSize': 1})
+            return status, data, asyncio.get_running_loop().time() - started
+
+    status, data, elapsed = run_with_stub(stub, scenario)
+    assert status == 503 and data is None
+    assert stub.requests['on_sale'] == 4
+    assert 0.35 <= elapsed < 1.0  # 0.05 + 0.1 + 0.2
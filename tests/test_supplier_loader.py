@@ -0,0 +1,71 @@
+# Інжест постачальників: невдалий фід не прибирає офери постачальника зі зведеної таблиці.
+import asyncio
+import os
+
+import pytest
+
+from parsers.supplier_loader import ResidentOffers, load_all_suppliers, load_cached_suppliers
+
+CONFIG = """suppliers:
+  s1: {method: local, file: s1.xml}
+  s2: {method: local, file: s2.xml}
+  s3: {method: local, file: s3.xml}
+"""
+
+
+def write_feed(path, offer_ids, price=100):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<yml_catalog><shop><offers>')
+        for offer_id in offer_ids:
+            f.write(f'<offer id="{offer_id}" available="true"><price>{price}</price>'
+                    f'<price_promo_rrp>{price * 2}</price_promo_rrp></offer>')
+        f.write('</offers></shop></yml_catalog>')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))  # Новий mtime навіть у ту ж секунду
+
+
+@pytest.fixture
+def feeds(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config.yaml').write_text(CONFIG, encoding='utf-8')
+    write_feed('s1.xml', ['A1', 'A2'])
+    write_feed('s2.xml', ['B1', 'B2', 'B3'])  # s3.xml немає — постачальник ще жодного разу не вдався
+    return tmp_path
+
+
+def load(resident=None):
+    stats = {}
+    merged = asyncio.run(load_all_suppliers('config.yaml', stats=stats, resident=resident))
+    return merged, stats.get('fallback')
+
+
+def test_broken_or_missing_feed_falls_back_to_last_good_parse(feeds):
+    merged, fallback = load()
+    assert sorted(merged) == ['A1', 'A2', 'B1', 'B2', 'B3'] and fallback == []
+
+    with open('s2.xml', 'w', encoding='utf-8') as f:
+        f.write('<yml_catalog><shop><offers><offer id="B1"')  # Обірваний фід
+    merged, fallback = load()
+    assert sorted(merged) == ['A1', 'A2', 'B1', 'B2', 'B3'] and fallback == ['s2']
+
+    os.remove('s2.xml')
+    write_feed('s1.xml', ['A1', 'A2', 'A3'])
+    merged, fallback = load()
+    assert sorted(merged) == ['A1', 'A2', 'A3', 'B1', 'B2', 'B3'] and fallback == ['s2']
+
+    cached, missing = load_cached_suppliers('config.yaml')  # price/export-feed з кешу — той самий вдалий фід
+    assert sorted(cached) == ['A1', 'A2', 'A3', 'B1', 'B2', 'B3'] and missing == ['s3']
+
+
+def test_resident_keeps_failed_supplier_unchanged(feeds):
+    resident = ResidentOffers()
+    first, _ = load(resident)
+    os.remove('s2.xml')
+    merged, _ = load(resident)
+    assert resident.changed == []
+    assert merged is first  # Нічого не змінилося — та сама зведена таблиця
+
+    write_feed('s2.xml', ['B1'], price=120)
+    merged, fallback = load(resident)
+    assert resident.changed == ['s2'] and fallback == []
+    assert sorted(merged) == ['A1', 'A2', 'B1'] and merged['B1'].purchase_price == 120
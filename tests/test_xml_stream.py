@@ -0,0 +1,65 @@
+# Потоковий парсер фідів постачальників (parsers/xml_stream.py) проти старого шляху через ET.parse.
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from core.records import SupplierOffer
+from parsers.xml_stream import iter_offers, parse_offers_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EDGE_FEED = """<?xml version="1.0" encoding="utf-8"?>
+<yml_catalog><shop><categories><category id="1">Ігри</category></categories><offers>
+<offer id="A1" available="true"><price>100,50</price><price_rrp>150</price_rrp><price_promo_rrp>140,5</price_promo_rrp></offer>
+<offer id="A2" available="TRUE"><price>200</price><price_rrp>260,9</price_rrp></offer>
+<offer id="A3" available="false"><price>300</price><price_promo_rrp>0</price_promo_rrp></offer>
+<offer id="A4"><price></price><name>Без ціни</name></offer>
+<offer available="true"><price>10</price></offer>
+<offer id="A1" available="false"><price>99</price><price_promo_rrp>120</price_promo_rrp></offer>
+</offers></shop></yml_catalog>
+"""
+
+
+def et_parse_offers(file_name):
+    """Старий парсер (до iterparse): усе дерево через ET.parse і findall, правила — як були інлайн."""
+    supplier_dict = {}
+    for sup_offer in ET.parse(file_name).getroot().findall(".//offer"):
+        supplier_id = sup_offer.get("id")
+        if not supplier_id:
+            continue
+        available = "true" if sup_offer.get("available", "false").lower() == "true" else "false"
+        purchase_text = sup_offer.findtext("price") or "0"
+        old_price_text = sup_offer.findtext("price_rrp") or None
+        rrp_price_text = sup_offer.findtext("price_promo_rrp") or None
+
+        purchase_price = float(purchase_text.replace(',', '.')) if purchase_text else 0.0
+        old_price = float(old_price_text.replace(',', '.')) if old_price_text else None
+        if rrp_price_text and float(rrp_price_text.replace(',', '.')) > 0:
+            supplier_price, is_rrp_fallback = float(rrp_price_text.replace(',', '.')), False
+        elif old_price_text:
+            supplier_price, is_rrp_fallback = old_price, True
+        else:
+            supplier_price, is_rrp_fallback = 0.0, True
+        supplier_dict[supplier_id] = SupplierOffer(purchase_price, supplier_price, old_price, available,
+                                                   100 if available == "true" else 0, is_rrp_fallback)
+    return supplier_dict
+
+
+def test_edge_cases_match_et_parse(tmp_path):
+    path = tmp_path / 'feed.xml'
+    path.write_text(EDGE_FEED, encoding='utf-8')
+    offers = parse_offers_file(str(path))
+    assert offers == et_parse_offers(str(path))
+    assert list(offers) == ['A1', 'A2', 'A3', 'A4']
+    assert offers['A1'] == SupplierOffer(99.0, 120.0, None, 'false', 0, False)  # Дубль id — виграє останній
+    assert offers['A2'].supplier_price == 260.9 and offers['A2'].is_rrp_fallback
+    assert offers['A4'] == SupplierOffer(0.0, 0.0, None, 'false', 0, True)
+
+
+def test_real_feed_matches_et_parse():
+    path = os.path.join(ROOT, 'mental_price.xml')
+    if not os.path.exists(path):
+        pytest.skip('mental_price.xml немає')
+    pairs = list(iter_offers(path))
+    assert dict(pairs) == et_parse_offers(path)
+    assert len(pairs) > 1000
@@ -0,0 +1,115 @@
+# Дифф фіду (FeedDiff) і запис YML.
+import gzip
+import io
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import core.yml_generator as yml_generator
+from core.records import Match, Recommendation, RozetkaItem, SupplierOffer
+from core.yml_generator import SHOP_COMPANY, SHOP_NAME, SHOP_URL, FeedDiff, write_delta_feed, write_rozetka_yml
+
+
+def offer(offer_id, price, available='true', stock_quantity=3):
+    return {'offer_id': offer_id, 'price': price, 'oldprice': price * 1.2, 'available': available,
+            'stock_quantity': stock_quantity, 'name': f"Товар {offer_id}"}
+
+
+def diff(previous, offers):
+    feed_diff = FeedDiff(previous)
+    for fields in offers:
+        feed_diff.add(fields)
+    return feed_diff
+
+
+def test_requeue_reverts_snapshot_so_offers_stay_in_next_delta():
+    first = diff({}, [offer('A', 100), offer('B', 200)])
+    second = diff(first.snapshot, [offer('A', 110), offer('B', 200), offer('C', 300)])
+    assert [fields['offer_id'] for fields in second.delta] == ['A', 'C']
+
+    second.requeue(['A', 'C'])  # Push не прийнято
+    assert second.snapshot['A'] == first.snapshot['A']
+    assert 'C' not in second.snapshot
+
+    third = diff(second.snapshot, [offer('A', 110), offer('B', 200), offer('C', 300)])
+    assert [fields['offer_id'] for fields in third.delta] == ['A', 'C']
+    assert third.added == ['C']
+
+
+def test_delta_feed_withdraws_removed_offers(tmp_path):
+    first = diff({}, [offer('A', 100), offer('B', 200)])
+    second = diff(first.snapshot, [offer('A', 110)])
+    assert second.finish() == 1
+
+    delta_file = str(tmp_path / 'delta.xml')
+    manifest = write_delta_feed(second, 'full.xml', 1, delta_file=delta_file, manifest_dir=str(tmp_path / 'manifests'))
+    assert manifest['removed'] == ['B'] and manifest['delta_count'] == 2
+
+    offers = {element.get('id'): element for element in ET.parse(delta_file).getroot().iter('offer')}
+    assert list(offers) == ['A', 'B']
+    assert offers['A'].get('available') == 'true' and offers['A'].findtext('price') == '110'
+    assert offers['B'].get('available') == 'false' and offers['B'].findtext('stock_quantity') == '0'
+
+
+def test_manifests_from_the_same_second_do_not_overwrite(tmp_path):
+    manifest_dir = tmp_path / 'manifests'
+    for _ in range(3):
+        write_delta_feed(diff({}, [offer('A', 100)]), 'full.xml', 1, delta_file=str(tmp_path / 'delta.xml'),
+                         manifest_dir=str(manifest_dir))
+    assert len(os.listdir(manifest_dir)) == 3
+
+
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 1, 2, 3, 4, 5)
+
+
+def make_match(i, name):
+    return Match(str(500000000 + i), f"U{i:04d}", RozetkaItem(name=name),
+                 SupplierOffer(100.0, 150.0, available='true' if i % 2 else 'false', stock_quantity=i % 2 * 100),
+                 Recommendation(final_price=199.0 + i, old_price_recommended=round(260.5 + i / 3, 2)))
+
+
+def et_feed(matches, date):
+    """Старий генератор (до потокового запису): усе дерево в ElementTree і tree.write."""
+    yml = ET.Element("yml_catalog", date=date)
+    shop = ET.SubElement(yml, "shop")
+    ET.SubElement(shop, "name").text = SHOP_NAME
+    ET.SubElement(shop, "company").text = SHOP_COMPANY
+    ET.SubElement(shop, "url").text = SHOP_URL
+    currencies = ET.SubElement(shop, "currencies")
+    ET.SubElement(currencies, "currency", id="UAH", rate="1")
+    categories = ET.SubElement(shop, "categories")
+    ET.SubElement(categories, "category", id="1").text = "Default"
+    offers = ET.SubElement(shop, "offers")
+    for match in matches:
+        offer = ET.SubElement(offers, "offer", id=match.price_offer_id, available=match.supplier.available)
+        ET.SubElement(offer, "price").text = str(match.recommendations.final_price)
+        ET.SubElement(offer, "oldprice").text = str(match.recommendations.old_price_recommended)
+        ET.SubElement(offer, "currencyId").text = "UAH"
+        ET.SubElement(offer, "categoryId").text = "1"
+        ET.SubElement(offer, "stock_quantity").text = str(match.supplier.stock_quantity)
+        ET.SubElement(offer, "name").text = match.rozetka.name
+    buffer = io.BytesIO()
+    ET.ElementTree(yml).write(buffer, encoding="utf-8", xml_declaration=True)
+    return buffer.getvalue()
+
+
+def test_streamed_feed_matches_element_tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(yml_generator, 'datetime', FixedDatetime)
+    names = ['Гра PS5 "Spider-Man" & DLC', "Кабель <HDMI> 2'м", 'Звичайний товар', '']
+    matches = [make_match(i, names[i % len(names)]) for i in range(50)]
+    expected = et_feed(matches, '2026-01-02 03:04')
+
+    output_file = str(tmp_path / 'feed.xml')
+    assert write_rozetka_yml(iter(matches), output_file) == 50
+    with open(output_file, 'rb') as f:
+        streamed = f.read()
+    # Побайтово відрізняється лише порожній <name />, тож порівнюємо канонічну форму (C14N)
+    assert ET.canonicalize(streamed.decode('utf-8')) == ET.canonicalize(expected.decode('utf-8'))
+    assert streamed.replace(b'<name></name>', b'<name />') == expected
+
+    assert write_rozetka_yml(matches, output_file + '.gz') == 50
+    with gzip.open(output_file + '.gz', 'rb') as f:
+        assert f.read() == streamed
@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import sqlite3
+
+from core.records import RozetkaItem
+
+# Поля товару, що зберігаються колонками (hierarchy — окремо, один раз на категорію)
+ITEM_FIELDS = ('name', 'price', 'price_old', 'commission_percent', 'commission_sum', 'brand',
+               'category_id', 'available', 'stock_quantity', 'price_offer_id')
+_CATEGORY_COLUMN = ITEM_FIELDS.index('category_id')
+
+
+class ItemsCache:
+    """SQLite-сховище кешу товарів Rozetka.
+
+    Ієрархії зберігаються один раз на category_id, товари посилаються на них. Колонки без типу,
+    тож SQLite зберігає значення як є (str/int/float). Кожен запис — одна транзакція, тому файл
+    ніколи не лишається напівзаписаним.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key PRIMARY KEY, value)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS hierarchies (category_id PRIMARY KEY, hierarchy)")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS items (rz_id PRIMARY KEY, {', '.join(ITEM_FIELDS)})")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def load_meta(self):
+        """{'timestamp': ..., 'total_count': ...} або {}, якщо кеш ще не записувався."""
+        return {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM meta")}
+
+    def _hierarchies(self):
+        return {category_id: json.loads(hierarchy)
+                for category_id, hierarchy in self._conn.execute("SELECT category_id, hierarchy FROM hierarchies")}
+
+    @staticmethod
+    def _row_to_item(row, hierarchies):
+        # Порядок ITEM_FIELDS збігається з полями RozetkaItem, hierarchy — останнє
+        return RozetkaItem(*row, hierarchies.get(row[_CATEGORY_COLUMN], []))
+
+    def iter_items(self):
+        """Ліниво: yield (rz_id, item) без завантаження всієї таблиці в пам'ять."""
+        hierarchies = self._hierarchies()
+        for row in self._conn.execute(f"SELECT rz_id, {', '.join(ITEM_FIELDS)} FROM items"):
+            yield row[0], self._row_to_item(row[1:], hierarchies)
+
+    def load_items(self):
+        """Усі товари як dict {rz_id: RozetkaItem}."""
+        return dict(self.iter_items())
+
+    def get_item(self, rz_id):
+        """Один товар за rz_id або None."""
+        row = self._conn.execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items WHERE rz_id = ?",
+                                 (str(rz_id),)).fetchone()
+        if row is None:
+            return None
+        item = RozetkaItem(*row)
+        hierarchy = self._conn.execute("SELECT hierarchy FROM hierarchies WHERE category_id = ?",
+                                       (item.category_id,)).fetchone()
+        item.hierarchy = json.loads(hierarchy[0]) if hierarchy else []
+        return item
+
+    def _write_items(self, items):
+        hierarchies = {}
+        rows = []
+        for rz_id, item in items.items():
+            if item.category_id is not None:
+                hierarchies.setdefault(item.category_id, item.hierarchy or [])
+            rows.append((str(rz_id),) + tuple(getattr(item, field) for field in ITEM_FIELDS))
+        self._conn.executemany("INSERT OR REPLACE INTO hierarchies VALUES (?, ?)",
+                               [(cat_id, json.dumps(h, ensure_ascii=False)) for cat_id, h in hierarchies.items()])
+        self._conn.executemany(f"INSERT OR REPLACE INTO items VALUES ({', '.join('?' * (len(ITEM_FIELDS) + 1))})", rows)
+
+    def _write_meta(self, timestamp):
+        total = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                               [('timestamp', json.dumps(timestamp)), ('total_count', json.dumps(total))])
+
+    def replace_items(self, items, timestamp):
+        """Повна перезапис кешу однією транзакцією."""
+        with self._conn:
+            self._conn.execute("DELETE FROM items")
+            self._conn.execute("DELETE FROM hierarchies")
+            self._write_items(items)
+            self._write_meta(timestamp)
+
+    def update_items(self, changed, removed_ids, timestamp):
+        """Записує лише змінені/нові товари і видаляє зниклі (одна транзакція)."""
+        with self._conn:
+            self._write_items(changed)
+            self._conn.executemany("DELETE FROM items WHERE rz_id = ?", [(str(rz_id),) for rz_id in removed_ids])
+            self._write_meta(timestamp)
+
+    def touch(self, timestamp):
+        """Лише оновлює timestamp кешу (лістинг звірено, змін немає)."""
+        with self._conn:
+            self._write_meta(timestamp)
+
+    def migrate_from_json(self, json_path):
+        """Одноразово переносить старий JSON-кеш (rozetka_cache.json), якщо SQLite ще порожній."""
+        if self.load_meta() or not os.path.exists(json_path):
+            return False
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            items = {rz_id: RozetkaItem.from_dict(item) for rz_id, item in cache.get('items', {}).items()}
+            self.replace_items(items, cache.get('timestamp', '2020-01-01T00:00:00'))
+            logging.info(f"Кеш мігровано з {json_path} у {self.path}: {len(self)} товарів")
+            return True
+        except Exception as e:
+            logging.warning(f"Не вдалося мігрувати {json_path}: {e}")
+            return False
+
+
+class PriceMemo:
+    """SQLite-мемо розрахунку цін: ключ — хеш вхідних даних ціноутворення, значення — результат (JSON).
+
+    Записи, не використані найдовше, витісняються понад max_entries (last_used — номер прогону).
+    reused/recomputed — лічильники поточного прогону.
+    """
+
+    def __init__(self, path, max_entries=200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.reused = 0
+        self.recomputed = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS memo (key PRIMARY KEY, result, last_used)")
+        self._run = (self._conn.execute("SELECT MAX(last_used) FROM memo").fetchone()[0] or 0) + 1
+        self._used = []
+        self._new = []
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM memo").fetchone()[0]
+
+    def get_many(self, keys, chunk_size=500):
+        """{key: result} для ключів, що є в мемо (запити пачками по chunk_size)."""
+        keys = list(keys)
+        found = {}
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            rows = self._conn.execute(f"SELECT key, result FROM memo WHERE key IN ({', '.join('?' * len(chunk))})",
+                                      chunk)
+            found.update((key, json.loads(result)) for key, result in rows)
+        self._used.extend(found)
+        return found
+
+    def put(self, key, result):
+        self._new.append((key, json.dumps(result, ensure_ascii=False), self._run))
+
+    def flush(self):
+        """Записує нові результати, оновлює last_used використаних і витісняє зайве (одна транзакція)."""
+        if not self._new and not self._used:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO memo VALUES (?, ?, ?)", self._new)
+            self._conn.executemany("UPDATE memo SET last_used = ? WHERE key = ?",
+                                   [(self._run, key) for key in self._used])
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self._conn.execute("DELETE FROM memo WHERE key IN "
+                                   "(SELECT key FROM memo ORDER BY last_used LIMIT ?)", (excess,))
+                logging.info(f"Мемо цін: витіснено {excess} записів")
+        self._new = []
+        self._used = []
@@ -0,0 +1,214 @@
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource  # Лише Unix; у Windows — psutil, якщо встановлено, інакше без RSS
+except ImportError:
+    resource = None
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+RUN_REPORT_DIR = "output/reports"  # JSON-звіт кожного прогону: run-<час>.json
+RUN_REPORT_KEEP = 200  # Скільки останніх звітів прогонів зберігати (демон пише звіт на кожен перерахунок)
+PROFILE_DIR = "output/profiles"  # Профілі етапів з profile_stages
+
+_active = None  # RunProfiler поточного прогону (для stage() з будь-якого модуля)
+
+
+def setup_logging(level=logging.INFO):
+    """Налаштування логування для точки входу (CLI), а не під час імпорту модулів."""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+
+def prune_run_files(directory, keep, prefix='run-', suffix='.json'):
+    """Видаляє найстаріші файли prefix<час>suffix у directory, залишаючи keep останніх; повертає кількість."""
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(suffix))
+    except OSError:
+        return 0
+    stale = names[:-keep] if keep > 0 else names
+    for name in stale:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError as e:
+            logging.warning(f"Не вдалося видалити {name}: {e}")
+    return len(stale)
+
+
+def _rss_peak_mb():
+    """Піковий RSS процесу з початку роботи, МБ, або None, якщо на цій платформі його не виміряти."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024  # macOS — байти, Linux — КБ
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, 'peak_wset', memory.rss) / 1024 ** 2  # Windows: піковий working set
+
+
+def _round_mb(value):
+    return None if value is None else round(value, 1)
+
+
+def _format_mb(value, width=0):
+    return f"{'?':>{width}}" if value is None else f"{value:>{width}.0f}"
+
+
+class RunProfiler:
+    """Вимірювання етапів прогону: wall/CPU час, піковий RSS, лічильники, опційний профайлер.
+
+    Етап — with profiler.stage('назва') as counters: ...; у counters етап сам кладе кількості товарів,
+    HTTP-запитів, влучання кешів тощо. Вкладені етапи отримують назву 'батько/етап'.
+    profile_stages — повні назви етапів (як у звіті: 'pricing', 'catalog/hierarchy') під cProfile
+    (profiler='cprofile', .prof для snakeviz/pstats) або pyinstrument (profiler='pyinstrument', HTML). trace_memory=True додає піковий обсяг алокацій
+    Python на етап через tracemalloc (помітно сповільнює прогін). report_dir=None — без JSON-звіту;
+    у report_dir зберігаються лише keep_reports останніх звітів (None — усі).
+    """
+
+    def __init__(self, profile_stages=(), profiler='cprofile', trace_memory=False,
+                 report_dir=RUN_REPORT_DIR, profile_dir=PROFILE_DIR, command=None, keep_reports=RUN_REPORT_KEEP):
+        self.command = command
+        self.keep_reports = keep_reports
+        self.profile_stages = set(profile_stages)
+        self.profiler = profiler
+        self.trace_memory = trace_memory
+        self.report_dir = report_dir
+        self.profile_dir = profile_dir
+        self.stages = []
+        self.started = datetime.now()
+        self.report_file = None
+        self._stack = []  # [назва, накопичений пік tracemalloc] відкритих етапів
+        self._profiling = False
+        self._previous = None
+
+    def __enter__(self):
+        global _active
+        self._previous, _active = _active, self
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        if self.trace_memory:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        _active = self._previous
+        self.wall_s = time.perf_counter() - self._wall
+        self.cpu_s = time.process_time() - self._cpu
+        if self.trace_memory:
+            tracemalloc.stop()
+        if self.report_dir:
+            self.write_report(failed=exc_type is not None)
+
+    @contextmanager
+    def stage(self, name):
+        full_name = '/'.join([entry[0] for entry in self._stack] + [name])
+        counters = {}
+        record = {'name': full_name}
+        self.stages.append(record)  # У порядку початку етапів; вимірювання заповнюються в кінці
+        if self.trace_memory:
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append([name, 0])
+
+        profile = None
+        if full_name in self.profile_stages and not self._profiling:
+            profile = self._start_profile()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield counters
+        finally:
+            record['wall_s'] = round(time.perf_counter() - wall, 4)
+            record['cpu_s'] = round(time.process_time() - cpu, 4)
+            record['rss_peak_mb'] = _round_mb(_rss_peak_mb())
+            _, traced_peak = self._stack.pop()
+            if self.trace_memory:
+                traced_peak = max(traced_peak, tracemalloc.get_traced_memory()[1])
+                record['traced_peak_mb'] = round(traced_peak / 1e6, 1)
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], traced_peak)
+            if profile is not None:
+                record['profile'] = self._stop_profile(profile, full_name)
+            record['counters'] = counters
+            logging.info(f"Етап {full_name}: {record['wall_s']:.2f} с (CPU {record['cpu_s']:.2f} с), "
+                         f"RSS пік {_format_mb(record['rss_peak_mb'])} МБ {counters or ''}")
+
+    def _start_profile(self):
+        self._profiling = True
+        if self.profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+                profile = Profiler(async_mode='enabled')
+                profile.start()
+                return profile
+            except ImportError:
+                logging.warning("pyinstrument не встановлено, використовуємо cProfile")
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def _stop_profile(self, profile, stage_name):
+        self._profiling = False
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = os.path.join(self.profile_dir,
+                            f"run-{self.started.strftime('%Y%m%d-%H%M%S')}-{stage_name.replace('/', '-')}")
+        if isinstance(profile, cProfile.Profile):
+            profile.disable()
+            profile.dump_stats(f"{base}.prof")
+            return f"{base}.prof"
+        profile.stop()
+        with open(f"{base}.html", 'w', encoding='utf-8') as f:
+            f.write(profile.output_html())
+        return f"{base}.html"
+
+    def report(self):
+        return {
+            'command': self.command,
+            'started': self.started.isoformat(),
+            'wall_s': round(self.wall_s, 4),
+            'cpu_s': round(self.cpu_s, 4),
+            'rss_peak_mb': _round_mb(_rss_peak_mb()),
+            'stages': self.stages,
+        }
+
+    def write_report(self, failed=False):
+        """Пише JSON-звіт прогону в report_dir, повертає шлях."""
+        report = self.report()
+        report['failed'] = failed
+        os.makedirs(self.report_dir, exist_ok=True)
+        self.report_file = os.path.join(self.report_dir, f"run-{self.started.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(self.report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        logging.info(f"Звіт прогону: {self.report_file}")
+        if self.keep_reports:
+            prune_run_files(self.report_dir, self.keep_reports)
+        return self.report_file
+
+    def print_summary(self):
+        print(f"\n=== ЕТАПИ ПРОГОНУ ({self.wall_s:.2f} с) ===")
+        for record in self.stages:
+            counters = ', '.join(f"{key}={value}" for key, value in record['counters'].items())
+            print(f"{record['name']:<22} {record['wall_s']:>8.2f} с  CPU {record['cpu_s']:>7.2f} с  "
+                  f"RSS {_format_mb(record['rss_peak_mb'], 6)} МБ  {counters}")
+        if self.report_file:
+            print(f"Звіт: {self.report_file}")
+
+
+@contextmanager
+def stage(name):
+    """Етап поточного RunProfiler; без активного профайлера — нічого не вимірює."""
+    if _active is None:
+        yield {}
+        return
+    with _active.stage(name) as counters:
+        yield counters